@@ -0,0 +1,72 @@
+"""Recording and comparing benchmark results."""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Callable
+
+
+def add_result_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--json", type=str, help="Write the results to this file")
+    parser.add_argument(
+        "--compare",
+        type=str,
+        help="Compare with results previously written with --json, failing if "
+        "anything got slower by more than the tolerance",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown when comparing (default: %(default)s)",
+    )
+
+
+def measure(function: Callable[[], object], runs: int) -> list[float]:
+    """How long each of several calls to function took, in seconds."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(times: list[float], offset: float = 0) -> dict[str, float]:
+    """The fastest and median of several timings in seconds, in milliseconds."""
+    return {
+        "min_ms": (min(times) - offset) * 1000,
+        "median_ms": (statistics.median(times) - offset) * 1000,
+    }
+
+
+def save_and_compare(args: argparse.Namespace, document: dict):
+    """Writes the results if --json was given and compares them with --compare,
+    exiting with an error if anything got slower. The timings are expected in
+    document["results"], keyed by name."""
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=1)
+    if args.compare is None:
+        return
+    with open(args.compare, encoding="utf-8") as f:
+        previous = json.load(f)
+    print()
+    if previous.get("config") != document.get("config"):
+        print("WARNING: the results being compared used different configurations")
+    previous = previous["results"]
+    slower = []
+    for name, result in document["results"].items():
+        if name not in previous:
+            continue
+        before = previous[name]["min_ms"]
+        print(
+            f"{name:<20} {before:9.2f}ms -> {result['min_ms']:.2f}ms "
+            f"({result['min_ms'] / before:.2f}x)"
+        )
+        if result["min_ms"] > before * (1 + args.tolerance):
+            slower.append(name)
+    if slower:
+        sys.exit(f"Got slower: {', '.join(slower)}")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Times the stages of converting synthetic glTF models of a controlled size:
+conversion, preparing and writing the CGFX, and the texture swizzler, Patricia
+tree and lookup table helpers. Each stage is timed separately, several times,
+and the fastest and median runs are reported."""
+
+import argparse
+import os.path
+import platform
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from PIL import Image
+
+import main
+from cgfx import patricia, swizzler
+from cgfx.luts import LutTable, generate_lut_commands
+from cgfx.txob import TextureFormat
+from common import add_result_arguments, measure, save_and_compare, summarize
+from synthetic import make_glb
+
+SIZES = {
+    "small": dict(meshes=4, bones=8, textures=2, keys=30),
+    "medium": dict(meshes=16, bones=64, textures=4, keys=120),
+    "large": dict(meshes=64, bones=256, textures=8, keys=600),
+}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--size",
+        choices=SIZES,
+        default="medium",
+        help="Preset model size (default: %(default)s)",
+    )
+    parser.add_argument("--meshes", type=int, help="Number of meshes")
+    parser.add_argument("--bones", type=int, help="Number of bones")
+    parser.add_argument("--textures", type=int, help="Number of textures")
+    parser.add_argument("--keys", type=int, help="Animation keys per bone channel")
+    parser.add_argument("--vertices", type=int, default=256, help="Vertices per mesh")
+    parser.add_argument(
+        "--texture-size", type=int, default=64, help="Width and height of textures"
+    )
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    config = dict(SIZES[args.size], vertices=args.vertices)
+    config["texture_size"] = args.texture_size
+    for name in ("meshes", "bones", "textures", "keys"):
+        if getattr(args, name) is not None:
+            config[name] = getattr(args, name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.glb")
+        with open(path, "wb") as f:
+            f.write(make_glb(**config))
+        gltf = main.load_gltf(path)
+        cgfx = main.convert_gltf(gltf)
+
+        strings, imag = main.prepare(cgfx)
+        image = Image.fromarray(
+            np.random.default_rng(0).integers(
+                0, 256, (config["texture_size"], config["texture_size"], 4), np.uint8
+            ),
+            "RGBA",
+        )
+        names = [f"bone{i}" for i in range(max(config["bones"], 1))]
+        lut = LutTable.phong(4 * 200 / 31).lut
+        stages = {
+            "convert_gltf": lambda: main.convert_gltf(gltf),
+            "prepare": lambda: main.prepare(cgfx),
+            "write": lambda: cgfx.write(strings, imag),
+            "swizzle": lambda: swizzler.swizzle(image, TextureFormat.RGBA4),
+            "patricia.generate": lambda: patricia.generate(names),
+            "generate_lut_commands": lambda: generate_lut_commands(lut),
+        }
+        results = {}
+        for name, function in stages.items():
+            results[name] = summarize(measure(function, args.runs))
+            print(
+                f"{name:<22} {results[name]['min_ms']:9.2f}ms "
+                f"(median {results[name]['median_ms']:.2f}ms)"
+            )
+
+    save_and_compare(
+        args,
+        {
+            "config": config,
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "commit": git_commit(),
+            },
+            "results": results,
+        },
+    )
+
+
+if __name__ == "__main__":
+    run_benchmarks()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Times building DICTs of many entries, like the bone DICT of a large
+skeleton, looking their entries up by name in the ways convert_gltf does, and
+generating their Patricia trees."""
+
+import argparse
+import os.path
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cgfx.dict import DICT
+from cgfx.sobj import Bone
+from common import add_result_arguments, measure, save_and_compare, summarize
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--bones", type=int, default=1000, help="Entries per DICT (default: 1000)"
+    )
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    names = [f"skeleton_bone_{i}" for i in range(args.bones)]
+    lookups = names[:]
+    random.Random(0).shuffle(lookups)
+    bones = DICT()
+
+    def build():
+        nonlocal bones
+        bones = DICT()
+        for name in names:
+            bones.add(name, Bone())
+
+    stages = {
+        "add": build,
+        "getitem": lambda: [bones[name] for name in lookups],
+        "get_index": lambda: [bones.get_index(name) for name in lookups],
+        "contains": lambda: [name + "_" in bones for name in lookups],
+        "sort": lambda: bones.sort(lambda n: n.name[::-1]),
+        "regenerate": lambda: bones.regenerate(),
+    }
+    results = {}
+    for name, function in stages.items():
+        results[name] = summarize(measure(function, args.runs))
+        print(
+            f"{name:<10} {results[name]['min_ms']:9.2f}ms "
+            f"(median {results[name]['median_ms']:.2f}ms)"
+        )
+    save_and_compare(args, {"config": {"bones": args.bones}, "results": results})
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Measures how long the CLI takes to start, to keep heavy imports off the
+startup path. Each command is run in a fresh interpreter several times and the
+fastest run is kept, minus the time an empty interpreter takes to start."""
+
+import argparse
+import os.path
+import re
+import subprocess
+import sys
+import time
+
+from common import add_result_arguments, save_and_compare, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    "help": ["main.py", "--help"],
+    "import main": ["-c", "import main"],
+    "import cgfx": ["-c", "import cgfx"],
+}
+
+
+def run(args: list[str], runs: int) -> list[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, check=True
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def slowest_imports(args: list[str], count: int) -> list[tuple[str, int]]:
+    """The top level imports with the largest cumulative time, in microseconds,
+    according to -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = re.fullmatch(r"import time:\s*\d+ \|\s*(\d+) \| (\S.*)", line)
+        # skip the interpreter's own startup
+        if match and match[2] not in ("site", "encodings"):
+            imports.append((match[2], int(match[1])))
+    return sorted(imports, key=lambda x: -x[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    interpreter = min(run(["-c", "pass"], args.runs))
+    results = {}
+    for name, command in COMMANDS.items():
+        times = run(command, args.runs)
+        results[name] = summarize(times, interpreter)
+        print(
+            f"{name:<12} {results[name]['min_ms']:7.1f}ms "
+            f"(median {results[name]['median_ms']:.1f}ms)"
+        )
+    print(f"(not counting {interpreter * 1000:.1f}ms to start the interpreter)")
+    print("\nSlowest imports of main.py --help:")
+    for module, us in slowest_imports(COMMANDS["help"], 10):
+        print(f"  {module:<30} {us / 1000:6.1f}ms")
+
+    save_and_compare(args, {"interpreter_ms": interpreter * 1000, "results": results})
+
+
+if __name__ == "__main__":
+    main()
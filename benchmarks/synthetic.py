@@ -0,0 +1,200 @@
+"""Generates glTF models of a controlled size for benchmarking. The models are
+deterministic, so results can be compared across commits."""
+
+import json
+import math
+import struct
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+
+def make_glb(
+    meshes: int = 1,
+    bones: int = 0,
+    textures: int = 0,
+    keys: int = 0,
+    vertices: int = 256,
+    texture_size: int = 64,
+    double_sided: bool = False,
+    normal_map: bool = False,
+    blend: bool = False,
+    interpolation: str = "LINEAR",
+) -> bytes:
+    """Returns a GLB with the given number of meshes of the given number of
+    vertices, a chain of bones that every mesh is skinned to, textures used by
+    the meshes' materials (also as normal maps if normal_map is set, and every
+    other material is translucent if blend is set), and an animation with this
+    many keys per bone for translation, rotation and scale, interpolated with
+    the given glTF interpolation."""
+    rng = np.random.default_rng(0)
+    buffer = bytearray()
+    model = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{"nodes": []}],
+        "nodes": [],
+        "meshes": [],
+        "materials": [],
+        "accessors": [],
+        "bufferViews": [],
+    }
+
+    def add_buffer_view(data: bytes) -> int:
+        buffer.extend(b"\0" * (-len(buffer) % 4))
+        model["bufferViews"].append(
+            {"buffer": 0, "byteOffset": len(buffer), "byteLength": len(data)}
+        )
+        buffer.extend(data)
+        return len(model["bufferViews"]) - 1
+
+    def add_accessor(data: np.ndarray, type: str, **kwargs) -> int:
+        component_type = {"float32": 5126, "uint16": 5123, "uint8": 5121}
+        model["accessors"].append(
+            {
+                "bufferView": add_buffer_view(data.tobytes()),
+                "componentType": component_type[data.dtype.name],
+                "count": len(data),
+                "type": type,
+                **kwargs,
+            }
+        )
+        return len(model["accessors"]) - 1
+
+    for i in range(textures):
+        pixels = rng.integers(0, 256, (texture_size, texture_size, 4), np.uint8)
+        png = BytesIO()
+        Image.fromarray(pixels, "RGBA").save(png, "PNG")
+        model.setdefault("images", []).append(
+            {
+                "name": f"texture{i}",
+                "bufferView": add_buffer_view(png.getvalue()),
+                "mimeType": "image/png",
+            }
+        )
+        model.setdefault("textures", []).append({"source": i})
+
+    for i in range(max(textures, 1)):
+        material = {"name": f"material{i}", "pbrMetallicRoughness": {}}
+        if textures:
+            material["pbrMetallicRoughness"]["baseColorTexture"] = {"index": i}
+        if textures and normal_map:
+            material["normalTexture"] = {"index": (i + 1) % textures}
+        if double_sided:
+            material["doubleSided"] = True
+        if blend and i % 2:
+            material["alphaMode"] = "BLEND"
+        model["materials"].append(material)
+
+    if bones:
+        ibms = np.tile(np.eye(4, dtype=np.float32), (bones, 1, 1))
+        ibms[:, 3, 1] = -np.arange(bones)
+        for i in range(bones):
+            model["nodes"].append({"name": f"bone{i}", "translation": [0, 1, 0]})
+            if i:
+                model["nodes"][i - 1]["children"] = [i]
+        model["scenes"][0]["nodes"].append(0)
+        model["skins"] = [
+            {
+                "joints": list(range(bones)),
+                "inverseBindMatrices": add_accessor(ibms, "MAT4"),
+            }
+        ]
+
+    # a strip of triangles along the bones
+    v = np.arange(vertices)
+    positions = np.stack(
+        [v % 2, v / 2 / max(vertices / 2, 1) * max(bones, 1), np.zeros(vertices)], 1
+    ).astype(np.float32)
+    normals = np.tile(np.float32([0, 0, 1]), (vertices, 1))
+    uvs = positions[:, :2] / positions[:, :2].max(0)
+    triangles = np.arange(vertices - 2)[:, None] + [0, 1, 2]
+    triangles[1::2] = triangles[1::2, ::-1]
+    for i in range(meshes):
+        attributes = {
+            "POSITION": add_accessor(
+                positions,
+                "VEC3",
+                min=positions.min(0).tolist(),
+                max=positions.max(0).tolist(),
+            ),
+            "NORMAL": add_accessor(normals, "VEC3"),
+            "TEXCOORD_0": add_accessor(uvs, "VEC2"),
+        }
+        if bones:
+            joints = np.minimum(positions[:, 1], bones - 1).astype(np.uint8)
+            attributes["JOINTS_0"] = add_accessor(
+                np.stack([joints, np.zeros_like(joints)], 1).repeat(2, 1), "VEC4"
+            )
+            attributes["WEIGHTS_0"] = add_accessor(
+                np.tile(np.float32([1, 0, 0, 0]), (vertices, 1)), "VEC4"
+            )
+        model["meshes"].append(
+            {
+                "name": f"mesh{i}",
+                "primitives": [
+                    {
+                        "attributes": attributes,
+                        "indices": add_accessor(
+                            triangles.astype(np.uint16).reshape(-1), "SCALAR"
+                        ),
+                        "material": i % len(model["materials"]),
+                    }
+                ],
+            }
+        )
+        node = {"name": f"mesh{i}", "mesh": i, "translation": [i * 2, 0, 0]}
+        if bones:
+            node["skin"] = 0
+        model["nodes"].append(node)
+        model["scenes"][0]["nodes"].append(len(model["nodes"]) - 1)
+
+    if bones and keys:
+        times = np.arange(keys, dtype=np.float32) / 30
+        t = add_accessor(times, "SCALAR", min=[0.0], max=[float(times[-1])])
+        angles = np.sin(times * 2) / 2
+        outputs = {
+            "translation": (
+                "VEC3",
+                np.stack([np.sin(times), 1 + 0 * times, 0 * times], 1),
+            ),
+            "rotation": (
+                "VEC4",
+                np.stack([0 * times, 0 * times, np.sin(angles), np.cos(angles)], 1),
+            ),
+            "scale": ("VEC3", np.tile(1 + np.sin(times)[:, None] / 4, (1, 3))),
+        }
+        samplers, channels = [], []
+        for i in range(bones):
+            for path, (type, output) in outputs.items():
+                if interpolation == "CUBICSPLINE":
+                    # zero in and out tangents around each value
+                    zeros = np.zeros_like(output)
+                    output = np.stack([zeros, output, zeros], 1)
+                    output = output.reshape(-1, output.shape[-1])
+                samplers.append(
+                    {
+                        "input": t,
+                        "output": add_accessor(output.astype(np.float32), type),
+                        "interpolation": interpolation,
+                    }
+                )
+                channels.append(
+                    {"sampler": len(samplers) - 1, "target": {"node": i, "path": path}}
+                )
+        model["animations"] = [
+            {"name": "animation", "samplers": samplers, "channels": channels}
+        ]
+
+    buffer.extend(b"\0" * (-len(buffer) % 4))
+    model["buffers"] = [{"byteLength": len(buffer)}]
+    json_data = json.dumps(model).encode()
+    json_data += b" " * (-len(json_data) % 4)
+    return (
+        struct.pack("<4sII", b"glTF", 2, 28 + len(json_data) + len(buffer))
+        + struct.pack("<I4s", len(json_data), b"JSON")
+        + json_data
+        + struct.pack("<I4s", len(buffer), b"BIN\0")
+        + buffer
+    )
@@ -0,0 +1,33 @@
+import importlib
+
+# submodules are imported when first used, so importing the package is cheap
+__all__ = [
+    "animation",
+    "canm",
+    "cenv",
+    "cflt",
+    "cgfx",
+    "cmdl",
+    "dict",
+    "layout",
+    "luts",
+    "mtob",
+    "patricia",
+    "primitives",
+    "quantization",
+    "reduction",
+    "shared",
+    "sobj",
+    "swizzler",
+    "txob",
+]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
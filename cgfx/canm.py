@@ -7,6 +7,7 @@ from .shared import (
     Vector4,
 )
 from .dict import DictInfo
+from array import array
 from enum import IntEnum, IntFlag
 from struct import Struct
 
@@ -99,51 +100,6 @@ class InterpolationType(IntEnum):
     CubicSpline = 2
 
 
-class InterpolationKey(InlineObject):
-    frame = 0.0
-    value = 0.0
-
-
-class UnifiedHermiteKey(InterpolationKey):
-    in_out_slope = 0.0
-
-
-class HermiteKey(InterpolationKey):
-    in_slope = 0.0
-    out_slope = 0.0
-
-
-class Hermite128Key(HermiteKey):
-    struct = Struct("ffff")
-
-    def __init__(self, frame=0, value=0, in_slope=0, out_slope=0):
-        self.frame = frame
-        self.value = value
-        self.in_slope = in_slope
-        self.out_slope = out_slope
-
-    def values(self):
-        return (self.frame, self.value, self.in_slope, self.out_slope)
-
-
-class UnifiedHermite96Key(UnifiedHermiteKey):
-    struct = Struct("fff")
-
-    def values(self):
-        return (self.frame, self.value, self.in_out_slope)
-
-
-class StepLinear64Key(InterpolationKey):
-    struct = Struct("ff")
-
-    def __init__(self, frame=0, value=0):
-        self.frame = frame
-        self.value = value
-
-    def values(self):
-        return (self.frame, self.value)
-
-
 class QuantizationType(IntEnum):
     Hermite128 = 0
     Hermite64 = 1
@@ -155,38 +111,145 @@ class QuantizationType(IntEnum):
     StepLinear32 = 7
 
 
+# bytes per key of each quantization
+KEY_SIZES = {
+    QuantizationType.Hermite128: 16,
+    QuantizationType.Hermite64: 8,
+    QuantizationType.Hermite48: 6,
+    QuantizationType.UnifiedHermite96: 12,
+    QuantizationType.UnifiedHermite48: 6,
+    QuantizationType.UnifiedHermite32: 4,
+    QuantizationType.StepLinear64: 8,
+    QuantizationType.StepLinear32: 4,
+}
+
+# quantizations whose keys are floats, without scale, offset and frame scale
+FLOAT_QUANTIZATIONS = (
+    QuantizationType.Hermite128,
+    QuantizationType.UnifiedHermite96,
+    QuantizationType.StepLinear64,
+)
+
+
 class FloatSegment(StandardObject):
     start_frame = 0.0
     end_frame = 0.0
     single_value: float | None = None
     interpolation = InterpolationType.Linear
     quantization = QuantizationType.Hermite128
-    keys: list[InterpolationKey]
-    scale = 1
-    offset = 0
-    frame_scale = 1
+    # keys are kept as columns rather than as key objects, and packed in one
+    # go when written. columns the quantization doesn't use are ignored
+    frames: array
+    key_values: array
+    in_slopes: array  # also the slopes of unified hermite keys
+    out_slopes: array
+    # header of quantized keys, see cgfx.quantization
+    value_scale = 1.0
+    value_offset = 0.0
+    frame_scale = 1.0
 
     def __init__(self):
-        self.keys = []
+        self.frames = array("d")
+        self.key_values = array("d")
+        self.in_slopes = array("d")
+        self.out_slopes = array("d")
+
+    def add_key(self, frame, value, in_slope=0.0, out_slope=0.0):
+        self.frames.append(frame)
+        self.key_values.append(value)
+        self.in_slopes.append(in_slope)
+        self.out_slopes.append(out_slope)
+
+    def key_columns(self) -> tuple[array, ...]:
+        match self.quantization:
+            case QuantizationType.Hermite128:
+                return (self.frames, self.key_values, self.in_slopes, self.out_slopes)
+            case QuantizationType.UnifiedHermite96:
+                return (self.frames, self.key_values, self.in_slopes)
+            case QuantizationType.StepLinear64:
+                return (self.frames, self.key_values)
+        raise ValueError(f"{self.quantization.name} keys aren't floats")
+
+    def quantized_keys(self):
+        from . import quantization
+
+        return quantization.Keys(
+            self.frames, self.key_values, self.in_slopes, self.out_slopes
+        )
 
-    def refresh_struct(self):
-        struct = "ffi"
+    def key_data(self) -> bytes:
+        """The keys as they're written, padded to 4 bytes."""
+        if self.quantization in FLOAT_QUANTIZATIONS:
+            columns = self.key_columns()
+            data = array("f", bytes(4 * len(columns) * len(self.frames)))
+            for i, column in enumerate(columns):
+                data[i :: len(columns)] = array("f", column)
+            return data.tobytes()
+        from . import quantization
+
+        format = quantization.FORMATS[self.quantization]
+        raw = quantization.quantize(
+            format,
+            self.quantized_keys(),
+            self.value_scale,
+            self.value_offset,
+            self.frame_scale,
+        )
+        if raw is None:
+            raise ValueError(f"keys don't fit in {self.quantization.name}")
+        data = quantization.pack(format, raw)
+        return data + b"\0" * (-len(data) % 4)
+
+    def quantize(self, tolerance: float):
+        """Switches to the smallest key format that keeps the curve within
+        tolerance of the keys, if there is one."""
+        if self.single_value is not None or not self.frames:
+            return
+        from . import quantization
+
+        choice = quantization.choose(
+            self.quantized_keys(), self.interpolation, tolerance
+        )
+        if choice is not None:
+            (
+                self.quantization,
+                self.value_scale,
+                self.value_offset,
+                self.frame_scale,
+            ) = choice
+        elif (
+            self.quantization == QuantizationType.Hermite128
+            and self.in_slopes == self.out_slopes
+        ):
+            self.quantization = QuantizationType.UnifiedHermite96
+
+    def header_format(self) -> str:
+        format = "ffi"
         if self.single_value is not None:
-            struct += "f"
-        else:
-            struct += "if"
-            if self.quantization not in (
-                QuantizationType.Hermite128,
-                QuantizationType.UnifiedHermite96,
-                QuantizationType.StepLinear64,
-            ):
-                struct += "fff"
-            for k in self.keys:
-                k.refresh_struct()
-                struct += k.struct.format
-        self.struct = Struct(struct)
+            return format + "f"
+        format += "if"
+        if self.quantization not in FLOAT_QUANTIZATIONS:
+            format += "fff"
+        return format
+
+    def key_size(self) -> int:
+        return len(self.frames) * KEY_SIZES[self.quantization]
+
+    def key_format(self) -> str:
+        size = self.key_size()
+        if self.quantization in FLOAT_QUANTIZATIONS:
+            return f"{size // 4}f"
+        # quantized keys are described as bytes, and padded to keep the next
+        # object aligned
+        return f"{size}B" + "x" * (-size % 4)
 
-    def values(self):
+    def refresh_struct(self):
+        format = self.header_format()
+        if self.single_value is None:
+            format += self.key_format()
+        self.struct = Struct(format)
+
+    def header_values(self) -> tuple:
         return (
             self.start_frame,
             self.end_frame,
@@ -199,25 +262,38 @@ class FloatSegment(StandardObject):
             (self.single_value,)
             if self.single_value is not None
             else (
-                len(self.keys),
+                len(self.frames),
                 # speed is used to accelerate lookups
                 # for this, time * speed * (num_keys-1) must < num_keys
                 # so speed < 1 / time
                 1 / (self.end_frame - self.start_frame),
             )
             + (
-                (self.scale, self.offset, self.frame_scale)
-                if self.quantization
-                not in (
-                    QuantizationType.Hermite128,
-                    QuantizationType.UnifiedHermite96,
-                    QuantizationType.StepLinear64,
-                )
+                (self.value_scale, self.value_offset, self.frame_scale)
+                if self.quantization not in FLOAT_QUANTIZATIONS
                 else ()
             )
-            + tuple(self.keys)
         )
 
+    def values(self):
+        if self.single_value is not None:
+            return self.header_values()
+        return self.header_values() + Struct(self.key_format()).unpack(self.key_data())
+
+    def prepare(self, offset: int, strings, imag) -> int:
+        # there are no strings, data or objects among the values
+        self.refresh_struct()
+        self.offset = offset
+        return offset + self.struct.size
+
+    def write(self, strings, imag) -> bytes:
+        # packing every key through real_values takes time quadratic in
+        # their number
+        data = Struct(self.header_format()).pack(*self.header_values())
+        if self.single_value is None:
+            data += self.key_data()
+        return data
+
 
 class FloatAnimationCurve(AnimationCurve):
     segments: list[FloatSegment]
@@ -303,6 +379,8 @@ class CANMBone(StandardObject):
     unknown1 = ""
     unknown2 = ""
     primitive_type = 0
+    # attributes holding float animation curves or constants
+    channels: tuple[str, ...] = ()
 
     def values(self):
         return (
@@ -317,6 +395,7 @@ class CANMBone(StandardObject):
 class CANMBoneVector2(CANMBone):
     flags = Vector2Flag(0)
     primitive_type = PrimitiveType.Vector2
+    channels = ("x", "y")
     x: None | float | FloatAnimationCurve = None
     y: None | float | FloatAnimationCurve = None
 
@@ -345,6 +424,17 @@ class CANMBoneVector2(CANMBone):
 class CANMBoneTransform(CANMBone):
     flags = TransformFlag(0)
     primitive_type = PrimitiveType.Transform
+    channels = (
+        "scale_x",
+        "scale_y",
+        "scale_z",
+        "rot_x",
+        "rot_y",
+        "rot_z",
+        "pos_x",
+        "pos_y",
+        "pos_z",
+    )
     scale_x: None | float | FloatAnimationCurve = None
     scale_y: None | float | FloatAnimationCurve = None
     scale_z: None | float | FloatAnimationCurve = None
@@ -446,6 +536,7 @@ class CANMBoneBakedTransform(CANMBone):
 class CANMBoneRgbaColor(CANMBone):
     struct = Struct(CANMBone.struct.format + "iiii")
     primitive_type = PrimitiveType.RgbaColor
+    channels = ("red", "green", "blue", "alpha")
     flags = RgbaColorFlags(0)
     red: None | float | FloatAnimationCurve = None
     green: None | float | FloatAnimationCurve = None
@@ -476,8 +567,6 @@ class CANMBoneRgbaColor(CANMBone):
                 struct += "i"
                 if values[i] is None:
                     flags |= ignore_flags[i]
-            if const_flags[i] == TransformFlag.RotZConst:
-                struct += "xxxx"
         self.flags = flags
         self.struct = Struct(CANMBone.struct.format + struct)
 
@@ -1,5 +1,5 @@
-from .shared import InlineObject, Signature, StandardObject, StringTable
-from typing import TypeVar, Generic
+from .shared import BlobPool, InlineObject, Signature, StandardObject, StringTable
+from typing import Callable, TypeVar, Generic
 from struct import Struct
 from . import patricia
 
@@ -7,6 +7,7 @@ T = TypeVar("T", bound=StandardObject)
 
 
 class Node(InlineObject, Generic[T]):
+    __slots__ = ("refbit", "left_index", "right_index", "name", "content")
     struct = Struct("ihhii")
     refbit: int
     left_index: int
@@ -32,10 +33,18 @@ class Node(InlineObject, Generic[T]):
 class DICT(StandardObject, Generic[T]):
     signature = Signature("DICT")
     nodes: list[Node]
+    # position in nodes of the first node with each name, valid for as long as
+    # nodes has indexed_count nodes and hasn't been reordered
+    indices: dict[str, int]
+    indexed_count: int
+    # names of the entries when the tree was last generated
+    tree_names: list[str]
 
     def __init__(self) -> None:
         super().__init__()
         self.nodes = [Node(None, None)]
+        self.reindex()
+        self.tree_names = []
 
     def refresh_struct(self):
         self.struct = Struct("4sii" + Node.struct.format * len(self.nodes))
@@ -47,39 +56,68 @@ class DICT(StandardObject, Generic[T]):
     def len(self):
         return len(self.nodes) - 1
 
+    def reindex(self):
+        self.indices = {}
+        for i, n in enumerate(self.nodes):
+            self.indices.setdefault(n.name, i)
+        self.indexed_count = len(self.nodes)
+
+    def find(self, name: str) -> int | None:
+        """Returns the position in nodes of the node with the given name. Nodes
+        added to or reordered in nodes directly are noticed and reindexed."""
+        if self.indexed_count != len(self.nodes):
+            self.reindex()
+        i = self.indices.get(name)
+        if i is not None and self.nodes[i].name != name:
+            self.reindex()
+            i = self.indices.get(name)
+        return i
+
     def __getitem__(self, name: str) -> T:
         if isinstance(name, int):
             return self.nodes[name + 1].content
-        # could be smarter but eh
-        for n in self.nodes:
-            if n.name == name:
-                return n.content
-        return None
+        i = self.find(name)
+        return None if i is None else self.nodes[i].content
+
+    def __contains__(self, name: str) -> bool:
+        return self.find(name) is not None
 
     def __iter__(self):
         for n in self.nodes[1:]:
             yield n.name
 
     def get_index(self, name: str) -> int:
-        for i in range(len(self.nodes)):
-            if self.nodes[i].name == name:
-                return i - 1
+        i = self.find(name)
+        return None if i is None else i - 1
 
     def add(self, name: str, data: T):
         self.nodes.append(Node(name, data))
-        self.regenerate()
+        if self.indexed_count == len(self.nodes) - 1:
+            self.indices.setdefault(name, len(self.nodes) - 1)
+            self.indexed_count += 1
+
+    def sort(self, key: Callable[[Node], object], start: int = 0):
+        """Sorts the entries from index start onwards."""
+        self.nodes[start + 1 :] = sorted(self.nodes[start + 1 :], key=key)
+        self.reindex()
+
+    def prepare(self, offset: int, strings: StringTable, imag: BlobPool) -> int:
+        # the tree is only needed in the file, so it's generated once the
+        # entries are final rather than on every add
+        if [n.name for n in self.nodes[1:]] != self.tree_names:
+            self.regenerate()
+        return super().prepare(offset, strings, imag)
 
     def regenerate(self):
-        tree = patricia.generate(
-            [n.get_name() for n in self.nodes if n != self.nodes[0]]
-        )
+        self.tree_names = [n.name for n in self.nodes[1:]]
+        tree = patricia.generate([n.get_name() for n in self.nodes[1:]])
         tree.root.idx_entry = -1
-        for n in self.nodes:
-            p = tree[n.get_name()]
-            assert p.name == n.get_name().ljust(
-                tree.string_length, "\0"
-            ), f"{p.name}, {n.get_name()}"
-            if n != self.nodes[0]:
+        for i, n in enumerate(self.nodes):
+            if i == 0:
+                p = tree.root
+            else:
+                p = tree.entries[i - 1]
+                assert tree.search(p.key)[0] is p, f"{n.name} can't be looked up"
                 n.refbit = p.refbit
             n.left_index = p.left.idx_entry + 1
             n.right_index = p.right.idx_entry + 1
@@ -102,6 +140,9 @@ class DictInfo(InlineObject, Generic[T]):
     def __getitem__(self, name: str) -> T:
         return self.dict[name]
 
+    def __contains__(self, name: str) -> bool:
+        return name in self.dict
+
     def len(self) -> int:
         return self.dict.len()
 
@@ -110,3 +151,108 @@ class DictInfo(InlineObject, Generic[T]):
 
     def get_index(self, name: str) -> int:
         return self.dict.get_index(name)
+
+
+class DictView:
+    """A DICT in a written file, looked up the way the 3DS runtime does it: by
+    descending the Patricia tree stored in the node array, testing one bit of
+    the name at each node. The data can be anything with find() that
+    struct.unpack_from accepts, like bytes or an mmap."""
+
+    header = Struct("<4sii")
+    node = Struct("<IHHii")
+    relative = Struct("<i")
+
+    offset: int
+    size: int
+    count: int
+
+    def __init__(self, data, offset: int) -> None:
+        self.data = data
+        self.offset = offset
+        signature, self.size, self.count = self.header.unpack_from(data, offset)
+        if signature != b"DICT":
+            raise ValueError(f"no DICT at 0x{offset:x}")
+
+    def node_offset(self, index: int) -> int:
+        return self.offset + self.header.size + index * self.node.size
+
+    def read_node(self, index: int) -> tuple[int, int, int]:
+        """Returns the refbit and the left and right node indices of a node."""
+        return self.node.unpack_from(self.data, self.node_offset(index))[:3]
+
+    def name_bytes(self, index: int) -> bytes | None:
+        field = self.node_offset(index) + 8
+        (relative,) = self.relative.unpack_from(self.data, field)
+        if not relative:
+            return None
+        start = field + relative
+        return bytes(self.data[start : self.data.find(b"\0", start)])
+
+    def name(self, index: int) -> str | None:
+        """The name of an entry, counted from 0 like DICT.get_index."""
+        name = self.name_bytes(index + 1)
+        return None if name is None else name.decode()
+
+    def content_offset(self, index: int) -> int | None:
+        """The absolute offset of the data of an entry."""
+        field = self.node_offset(index + 1) + 12
+        (relative,) = self.relative.unpack_from(self.data, field)
+        return field + relative if relative else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.name(i)
+
+    def get_index(self, name: str) -> int | None:
+        data = name.encode()
+        key = int.from_bytes(data, "little")
+        # the root's refbit is written as -1, so read unsigned it's higher than
+        # any other and the descent always leaves the root
+        refbit, left, _ = self.read_node(0)
+        current, index = refbit, left
+        refbit, left, right = self.read_node(index)
+        while current > refbit:
+            current = refbit
+            index = right if (key >> refbit) & 1 else left
+            refbit, left, right = self.read_node(index)
+        if index == 0 or self.name_bytes(index) != data:
+            return None
+        return index - 1
+
+    def __contains__(self, name: str) -> bool:
+        return self.get_index(name) is not None
+
+    def __getitem__(self, name: str) -> int | None:
+        index = self.get_index(name)
+        return None if index is None else self.content_offset(index)
+
+    def validate(self) -> list[str]:
+        """Compares the tree with the one patricia.generate builds for the
+        same names, and checks that every name can be looked up. Returns a
+        description of each problem found."""
+        if not self.count:
+            return []
+        problems = []
+        names = list(self)
+        tree = patricia.generate(names)
+        tree.root.idx_entry = -1
+        for i in range(self.count + 1):
+            p = tree.root if i == 0 else tree.entries[i - 1]
+            expected = (
+                0xFFFFFFFF if i == 0 else p.refbit,
+                p.left.idx_entry + 1,
+                p.right.idx_entry + 1,
+            )
+            if self.read_node(i) != expected:
+                label = repr(names[i - 1]) if i else "root"
+                problems.append(
+                    f"node {i} ({label}) is {self.read_node(i)}, expected {expected}"
+                )
+        for i, name in enumerate(names):
+            if self.get_index(name) != i:
+                problems.append(f"{name!r} is found at {self.get_index(name)}")
+        return problems
@@ -0,0 +1,179 @@
+import ast
+import bisect
+import functools
+import inspect
+import re
+import struct
+import textwrap
+from typing import Iterator
+from .shared import BaseObject, BlobPool, InlineObject, StandardObject, StringTable
+
+
+class Field:
+    start: int
+    format: str
+    path: str  # the objects containing the field, from the root
+    name: str
+
+    def __init__(self, start: int, format: str, path: str, name: str) -> None:
+        self.start = start
+        self.format = format
+        self.path = path
+        self.name = name
+
+    def size(self) -> int:
+        return struct.calcsize("<" + self.format)
+
+    def unpack(self, data: bytes) -> object:
+        """The field's value in a file, or None if the file is too short."""
+        if self.start + self.size() > len(data):
+            return None
+        return struct.unpack_from("<" + self.format, data, self.start)[0]
+
+    def __str__(self) -> str:
+        return f"{self.path}, {self.name} at 0x{self.start:x}"
+
+
+@functools.cache
+def field_names(cls: type) -> list[str] | None:
+    """The names of the values returned by cls.values(), if it returns a tuple
+    of attributes like most classes do."""
+    for klass in cls.__mro__:
+        if "values" in vars(klass):
+            break
+    try:
+        source = textwrap.dedent(inspect.getsource(klass.values))
+    except (OSError, TypeError):
+        return None
+    returns = [
+        node
+        for node in ast.walk(ast.parse(source))
+        if isinstance(node, ast.Return) and isinstance(node.value, ast.Tuple)
+    ]
+    if len(returns) != 1 or any(
+        isinstance(e, ast.Starred) for e in returns[0].value.elts
+    ):
+        return None
+    return [field_name(e) for e in returns[0].value.elts]
+
+
+def field_name(node: ast.expr) -> str:
+    # name conditional values and wrapped values like Reference(self.parent)
+    # after the attribute they come from
+    if isinstance(node, ast.IfExp):
+        node = node.body
+    if isinstance(node, ast.Call) and len(node.args) == 1:
+        node = node.args[0]
+    return ast.unparse(node).removeprefix("self.")
+
+
+def flat_names(obj: BaseObject, prefix: str = "") -> Iterator[tuple[str, object]]:
+    """Like obj.flat_values(), but with the name of each value."""
+    obj.refresh_struct()
+    values = obj.values()
+    names = field_names(type(obj))
+    if names is None or len(names) != len(values):
+        names = [str(i) for i in range(len(values))]
+    for name, v in zip(names, values):
+        if isinstance(v, InlineObject):
+            yield from flat_names(v, f"{prefix}{name}.")
+        else:
+            yield prefix + name, v
+
+
+def format_codes(format: str) -> list[str]:
+    """Splits a struct format into the codes of single values, like "4s" or "i"."""
+    codes = []
+    for count, code in re.findall(r"(\d*)([a-zA-Z?])", format):
+        if code == "s":
+            codes.append(count + code)
+        else:
+            codes += [code] * int(count or 1)
+    return codes
+
+
+def describe(obj: BaseObject) -> str:
+    name = getattr(obj, "name", None)
+    if isinstance(name, str) and name:
+        return f"{type(obj).__name__} {name!r}"
+    return type(obj).__name__
+
+
+def object_fields(obj: BaseObject, path: str) -> Iterator[Field]:
+    path = f"{path} > {describe(obj)}" if path else describe(obj)
+    names = flat_names(obj)
+    codes = format_codes(obj.struct.format)
+    byte_order = obj.struct.format[0] if obj.struct.format[0] in "@=<>!" else ""
+    children = []
+    data_name = None
+    for i, code in enumerate(codes):
+        start = (
+            obj.offset
+            + struct.calcsize(byte_order + "".join(codes[: i + 1]))
+            - struct.calcsize(byte_order + code)
+        )
+        if code == "x":
+            yield Field(start, code, path, "padding")
+            continue
+        if data_name is not None:
+            # data is written as its size followed by its offset
+            yield Field(start, code, path, f"{data_name} (offset)")
+            data_name = None
+            continue
+        name, v = next(names)
+        if isinstance(v, bytes):
+            yield Field(start, code, path, f"{name} (size)")
+            data_name = name
+            continue
+        if isinstance(v, StandardObject):
+            children.append(v)
+        yield Field(start, code, path, name)
+    for child in children:
+        yield from object_fields(child, path)
+
+
+def table_fields(table: StringTable | BlobPool, path: str) -> Iterator[Field]:
+    if isinstance(table, BlobPool):
+        for blob in table.blobs.values():
+            yield Field(
+                table.offset + blob.position,
+                f"{len(blob.data)}s",
+                path,
+                f"data of {len(blob.data)} bytes",
+            )
+    else:
+        for s, offset in table.table.items():
+            name = repr(s[:-1].decode(errors="replace"))
+            yield Field(table.offset + offset, f"{len(s)}s", path, name)
+    if table.padding:
+        yield Field(
+            table.offset + table.total - table.padding,
+            f"{table.padding}x",
+            path,
+            "padding",
+        )
+
+
+class Layout:
+    """Maps offsets in a written CGFX to the objects and fields written there,
+    using the offsets assigned by prepare()."""
+
+    fields: list[Field]
+    starts: list[int]
+
+    def __init__(self, root: BaseObject, strings: StringTable, imag: BlobPool) -> None:
+        self.fields = list(object_fields(root, ""))
+        self.fields += table_fields(strings, "string table")
+        if not imag.empty():
+            self.fields.append(Field(imag.offset - 8, "8s", "IMAG", "header"))
+            self.fields += table_fields(imag, "IMAG")
+        self.fields.sort(key=lambda f: f.start)
+        self.starts = [f.start for f in self.fields]
+
+    def find(self, offset: int) -> Field | None:
+        # shared strings and IMAG data overlap, so the field starting last
+        # before the offset doesn't always contain it
+        for i in range(bisect.bisect_right(self.starts, offset) - 1, -1, -1):
+            if offset < self.fields[i].start + self.fields[i].size():
+                return self.fields[i]
+        return None
@@ -1,21 +1,35 @@
 # straight translation from https://github.com/Gericom/EveryFileExplorer/blob/master/3DS/NintendoWare/GFX/PatriciaTreeGenerator.cs
+# names are handled as integer keys, see name_key
 
 
 class Node:
+    __slots__ = ("refbit", "left", "right", "idx_entry", "name", "key")
     refbit: int
     left: "Node"
     right: "Node"
     idx_entry: int
     name: str
+    key: int
 
 
 def get_bit(name: str, bit: int) -> bool:
     return ((ord(name[bit // 8]) >> (bit & 7)) & 1) != 0
 
 
+def name_key(name: str) -> int:
+    """Returns the name as an integer whose bit n is get_bit(name, n), so that
+    padding the name with zeros doesn't change it."""
+    if name.isascii():
+        data = name.encode("ascii")
+    else:
+        data = bytes(ord(c) & 0xFF for c in name)
+    return int.from_bytes(data, "little")
+
+
 class PatTree:
     root: Node
     string_length: int
+    entries: dict[int, Node]  # nodes by idx_entry
 
     def __init__(self, maxlen) -> None:
         self.string_length = maxlen
@@ -25,41 +39,51 @@ class PatTree:
         root.right = root
         root.idx_entry = 0
         root.name = "\0" * maxlen
+        root.key = 0
         self.root = root
+        self.entries = {}
 
     def add(self, name: str, index: int):
-        name = name.ljust(self.string_length, "\0")
+        key = name_key(name)
         new_node = Node()
         new_node.name = name
+        new_node.key = key
         new_node.idx_entry = index
 
-        left = self[name]
-
-        bit = self.string_length * 8 - 1
-        while get_bit(left.name, bit) == get_bit(name, bit):
-            bit -= 1
+        # the highest bit where the name differs from the closest one
+        different = self.search(key)[0].key ^ key
+        if not different:
+            raise ValueError(f"duplicate name {name!r}")
+        bit = different.bit_length() - 1
 
-        left, current = self.get_with_parent(name, bit)
+        left, current = self.search(key, bit)
 
         new_node.refbit = bit
-        new_node.left = left if get_bit(name, bit) else new_node
-        new_node.right = new_node if get_bit(name, bit) else left
-        if get_bit(name, current.refbit):
+        if (key >> bit) & 1:
+            new_node.left = left
+            new_node.right = new_node
+        else:
+            new_node.left = new_node
+            new_node.right = left
+        if (key >> current.refbit) & 1:
             current.right = new_node
         else:
             current.left = new_node
+        self.entries[index] = new_node
         return new_node
 
     def __getitem__(self, name: str) -> Node:
         return self.get_with_parent(name)[0]
 
     def get_with_parent(self, name: str, minbit=-1) -> tuple[Node]:
-        name = name.ljust(self.string_length, "\0")
+        return self.search(name_key(name), minbit)
+
+    def search(self, key: int, minbit=-1) -> tuple[Node]:
         current = self.root
         left = current.left
         while current.refbit > left.refbit and left.refbit > minbit:
             current = left
-            left = current.right if get_bit(name, current.refbit) else current.left
+            left = current.right if (key >> current.refbit) & 1 else current.left
         return (left, current)
 
 
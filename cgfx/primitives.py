@@ -43,6 +43,8 @@ class VertexAttributeFlag(IntFlag):
 
 class IndexStream(StandardObject):
     struct = Struct("ib?xxiiiiiiiii")
+    # index data doesn't need to be aligned to 16 bytes either
+    blob_alignment = 4
     data_type = DataType.UByte
     primitive_mode = 0
     visible = True
@@ -111,6 +113,8 @@ class VertexAttribute(StandardObject):
     type: int
     usage = VertexAttributeUsage.Position
     flags = VertexAttributeFlag(0)
+    # unlike textures, vertex data doesn't need to be aligned to 16 bytes
+    blob_alignment = 4
 
 
 class InterleavedVertexStream(VertexAttribute):
@@ -0,0 +1,299 @@
+"""Encoders for the quantized key formats of FloatSegment. Quantized keys store
+their frame, value and slopes as fixed point numbers, which the values in the
+segment header turn back into floats:
+
+    frame = raw frame / 2**fraction * frame_scale
+    value = raw value * value_scale + value_offset
+    slope = raw slope / 2**fraction
+
+This is experimental. The field layouts in FORMATS follow the bit layout that
+SPICA's KeyFrameQuantizationHelper reads, and cgfx.hexpat was made to match
+them, but no file using them has been checked on the console or against a file
+exported by the official tools, and slopes are assumed not to be multiplied by
+value_scale, which is why keys are only quantized when asked to."""
+
+import numpy as np
+
+from .canm import InterpolationType, QuantizationType
+
+# the furthest a key's frame may move, in frames
+FRAME_TOLERANCE = 1 / 64
+
+
+class KeyField:
+    name: str  # frame, value, slope (both slopes), in_slope or out_slope
+    bits: int
+    signed: bool
+    fraction: int  # fractional bits
+
+    def __init__(self, name: str, bits: int, signed=False, fraction=0) -> None:
+        self.name = name
+        self.bits = bits
+        self.signed = signed
+        self.fraction = fraction
+
+    def limits(self) -> tuple[int, int]:
+        if self.signed:
+            return -(1 << (self.bits - 1)), (1 << (self.bits - 1)) - 1
+        return 0, (1 << self.bits) - 1
+
+
+class KeyFormat:
+    quantization: QuantizationType
+    fields: dict[str, KeyField]
+    size: int  # in bytes
+
+    def __init__(self, quantization: QuantizationType, *fields: KeyField) -> None:
+        self.quantization = quantization
+        self.fields = {f.name: f for f in fields}
+        self.size = sum(f.bits for f in fields) // 8
+
+
+# the first field is in the lowest bits of a little endian key. these are the
+# reference for the packed keys in cgfx.hexpat
+FORMATS = {
+    f.quantization: f
+    for f in (
+        KeyFormat(
+            QuantizationType.Hermite64,
+            KeyField("frame", 12),
+            KeyField("value", 20),
+            KeyField("in_slope", 16, True, 8),
+            KeyField("out_slope", 16, True, 8),
+        ),
+        KeyFormat(
+            QuantizationType.Hermite48,
+            KeyField("frame", 12),
+            KeyField("value", 12),
+            KeyField("in_slope", 12, True, 5),
+            KeyField("out_slope", 12, True, 5),
+        ),
+        KeyFormat(
+            QuantizationType.UnifiedHermite48,
+            KeyField("frame", 16, False, 8),
+            KeyField("value", 16),
+            KeyField("slope", 16, True, 8),
+        ),
+        KeyFormat(
+            QuantizationType.UnifiedHermite32,
+            KeyField("frame", 8),
+            KeyField("value", 12),
+            KeyField("slope", 12, True, 5),
+        ),
+        KeyFormat(
+            QuantizationType.StepLinear32,
+            KeyField("frame", 12),
+            KeyField("value", 20),
+        ),
+    )
+}
+
+# formats to try for each interpolation, smallest first
+CANDIDATES = {
+    InterpolationType.Nearest: (QuantizationType.StepLinear32,),
+    InterpolationType.Linear: (QuantizationType.StepLinear32,),
+    InterpolationType.CubicSpline: (
+        QuantizationType.UnifiedHermite32,
+        QuantizationType.Hermite48,
+        QuantizationType.UnifiedHermite48,
+        QuantizationType.Hermite64,
+    ),
+}
+
+
+class Keys:
+    """The keys of a segment as float64 arrays."""
+
+    frames: np.ndarray
+    values: np.ndarray
+    in_slopes: np.ndarray
+    out_slopes: np.ndarray
+
+    def __init__(self, frames, values, in_slopes, out_slopes) -> None:
+        self.frames = np.asarray(frames, np.float64)
+        self.values = np.asarray(values, np.float64)
+        self.in_slopes = np.asarray(in_slopes, np.float64)
+        self.out_slopes = np.asarray(out_slopes, np.float64)
+
+    def slopes(self, name: str) -> np.ndarray:
+        return self.out_slopes if name == "out_slope" else self.in_slopes
+
+
+def quantize(
+    format: KeyFormat,
+    keys: Keys,
+    value_scale: float,
+    value_offset: float,
+    frame_scale: float,
+) -> dict[str, np.ndarray] | None:
+    """The raw fields of the keys, or None if some don't fit."""
+    raw = {}
+    for name, field in format.fields.items():
+        one = 1 << field.fraction
+        match name:
+            case "frame":
+                raw[name] = np.rint(keys.frames / frame_scale * one)
+            case "value":
+                raw[name] = np.rint((keys.values - value_offset) / value_scale)
+            case _:
+                raw[name] = np.rint(keys.slopes(name) * one)
+        low, high = field.limits()
+        if len(raw[name]) and (raw[name].min() < low or raw[name].max() > high):
+            return None
+    return raw
+
+
+def pack(format: KeyFormat, raw: dict[str, np.ndarray]) -> bytes:
+    packed = np.zeros(len(raw["frame"]), np.uint64)
+    shift = 0
+    for name, field in format.fields.items():
+        bits = raw[name].astype(np.int64) & ((1 << field.bits) - 1)
+        packed |= bits.astype(np.uint64) << np.uint64(shift)
+        shift += field.bits
+    keys = packed.astype("<u8").view(np.uint8).reshape(-1, 8)
+    return keys[:, : format.size].tobytes()
+
+
+def unpack(
+    format: KeyFormat,
+    data: bytes,
+    value_scale: float,
+    value_offset: float,
+    frame_scale: float,
+) -> dict[str, np.ndarray]:
+    """Decodes packed keys the way the header values say to."""
+    keys = np.frombuffer(data, np.uint8).reshape(-1, format.size)
+    padded = np.zeros((len(keys), 8), np.uint8)
+    padded[:, : format.size] = keys
+    packed = padded.view("<u8")[:, 0]
+    fields = {}
+    shift = 0
+    for name, field in format.fields.items():
+        bits = ((packed >> np.uint64(shift)) & np.uint64((1 << field.bits) - 1)).astype(
+            np.int64
+        )
+        if field.signed:
+            bits = np.where(bits >> (field.bits - 1), bits - (1 << field.bits), bits)
+        shift += field.bits
+        match name:
+            case "frame":
+                fields[name] = bits / (1 << field.fraction) * frame_scale
+            case "value":
+                fields[name] = bits * value_scale + value_offset
+            case _:
+                fields[name] = bits / (1 << field.fraction)
+    return fields
+
+
+def frame_scales(format: KeyFormat, frames: np.ndarray) -> list[float]:
+    """Frame scales to try, most exact first."""
+    field = format.fields["frame"]
+    top = field.limits()[1] / (1 << field.fraction)
+    last = frames.max()
+    scales = []
+    if last <= top:
+        scales.append(1.0)
+    steps = np.diff(frames)
+    steps = steps[steps > 0]
+    if len(steps) and last / steps.min() <= top:
+        scales.append(float(steps.min()))
+    if last > 0:
+        scales.append(float(last / top))
+    return scales
+
+
+def hermite_slope(
+    frames: np.ndarray,
+    values: np.ndarray,
+    in_slopes: np.ndarray,
+    out_slopes: np.ndarray,
+) -> np.ndarray:
+    """The steepest each hermite span between consecutive keys gets. Its slope
+    is a quadratic in the position through the span, so the largest one is at
+    either key or at the quadratic's vertex."""
+    steps = np.diff(frames)
+    lines = np.diff(values) / np.where(steps > 0, steps, np.inf)
+    m0, m1 = out_slopes[:-1], in_slopes[1:]
+    # slope = a*s**2 + b*s + m0, s going from 0 to 1 through the span
+    a = 3 * (m0 + m1) - 6 * lines
+    b = 6 * lines - 4 * m0 - 2 * m1
+    steepest = np.maximum(np.abs(m0), np.abs(m1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vertex = -b / (2 * a)
+        inside = (a != 0) & (vertex > 0) & (vertex < 1)
+        peak = np.abs(m0 - b * b / (4 * a))
+    return np.where(inside, np.maximum(steepest, peak), steepest)
+
+
+def curve_error(
+    keys: Keys,
+    decoded: dict[str, np.ndarray],
+    interpolation: InterpolationType,
+) -> float:
+    """A bound on how far the decoded curve gets from the original one."""
+    error = np.abs(decoded["value"] - keys.values).max()
+    frame_error = np.abs(decoded["frame"] - keys.frames).max()
+    steps = np.diff(keys.frames)
+    if interpolation == InterpolationType.Nearest:
+        # keys move by less than FRAME_TOLERANCE, which is too little to
+        # change which key a frame uses
+        return error
+    if interpolation == InterpolationType.Linear:
+        slopes = np.diff(keys.values) / np.where(steps > 0, steps, np.inf)
+        return error + np.abs(slopes).max(initial=0) * frame_error
+    slope_errors = []
+    for name in ("in_slope", "out_slope"):
+        slope = decoded.get(name, decoded.get("slope"))
+        slope_errors.append(np.abs(slope - keys.slopes(name)).max())
+    slope = hermite_slope(
+        keys.frames, keys.values, keys.in_slopes, keys.out_slopes
+    ).max(initial=0)
+    # a slope's hermite basis function reaches at most 4/27 of the key spacing
+    return (
+        error
+        + 4 / 27 * np.max(steps, initial=0) * sum(slope_errors)
+        + slope * frame_error
+    )
+
+
+def encode(
+    format: KeyFormat,
+    keys: Keys,
+    interpolation: InterpolationType,
+) -> tuple[float, float, float, float] | None:
+    """Picks header values for the keys in the format, returning them along
+    with the curve's error, or None if the keys can't be stored in it."""
+    if keys.frames.min() < 0:
+        return None
+    low, high = keys.values.min(), keys.values.max()
+    top = format.fields["value"].limits()[1]
+    # the header is stored as single precision floats
+    value_scale = float(np.float32((high - low) / top if high > low else 1))
+    value_offset = float(np.float32(low))
+    for frame_scale in frame_scales(format, keys.frames):
+        frame_scale = float(np.float32(frame_scale))
+        raw = quantize(format, keys, value_scale, value_offset, frame_scale)
+        if raw is None:
+            continue
+        decoded = unpack(
+            format, pack(format, raw), value_scale, value_offset, frame_scale
+        )
+        if np.abs(decoded["frame"] - keys.frames).max() > FRAME_TOLERANCE:
+            continue
+        error = curve_error(keys, decoded, interpolation)
+        return value_scale, value_offset, frame_scale, error
+    return None
+
+
+def choose(
+    keys: Keys, interpolation: InterpolationType, tolerance: float
+) -> tuple[QuantizationType, float, float, float] | None:
+    """The smallest quantized format that keeps the curve within tolerance,
+    with its value scale, value offset and frame scale."""
+    if not len(keys.frames):
+        return None
+    for quantization in CANDIDATES[interpolation]:
+        encoding = encode(FORMATS[quantization], keys, interpolation)
+        if encoding is not None and encoding[3] <= tolerance:
+            return (quantization, *encoding[:3])
+    return None
@@ -0,0 +1,522 @@
+"""Keyframe reduction for the float curves of an animation. glTF exporters
+tend to bake animations into a key for every frame, most of which the curve
+can do without:
+
+- keys that the curve between their neighbours already passes close to are
+  dropped, starting from the first and last key and adding back the worst
+  fitting key of each span until every span is within tolerance
+- linear curves are also fitted with hermite keys, whose slopes come from the
+  neighbouring keys
+- curves that stay within tolerance of one value become constants
+- curves are split into segments where their keys change character, and each
+  segment is reduced on its own, if that takes fewer bytes overall
+
+Keys are dropped for the whole tolerance, to be stored as floats, and for half
+of it, leaving the rest for quantizing them. Whichever of these and the
+original keys takes the fewest bytes is kept.
+
+The error is measured at the keys, and for curves that aren't stepped, at a
+third and two thirds of the way between them. Between two of the original keys,
+both the original and the reduced curve are cubics, so those samples give the
+largest error anywhere in between. Segments with the same interpolation are
+reduced together, as rows of flat arrays."""
+
+import itertools
+
+import numpy as np
+
+from .quantization import FORMATS
+from .canm import (
+    CANM,
+    FLOAT_QUANTIZATIONS,
+    FloatAnimationCurve,
+    FloatSegment,
+    InterpolationType,
+    QuantizationType,
+)
+
+# pieces with fewer keys rarely save more than a segment header takes
+MIN_KEYS = 16
+# the widest range of values every quantized format can hold, in tolerances
+VALUE_RANGE = min((1 << f.fields["value"].bits) - 1 for f in FORMATS.values())
+# turns a cubic's values at 0, 1/3, 2/3 and 1 into its coefficients
+CUBIC = np.linalg.inv(np.vander([0, 1 / 3, 2 / 3, 1], 4))
+
+
+def evaluate(
+    frames: np.ndarray,
+    values: np.ndarray,
+    in_slopes: np.ndarray,
+    out_slopes: np.ndarray,
+    interpolation: InterpolationType,
+    before: np.ndarray,
+    after: np.ndarray,
+    t: np.ndarray,
+) -> np.ndarray:
+    """The curve at frames t, which lie between the keys before and after.
+    Keys are indices into the flattened arrays, which is quicker to gather
+    from than indices along the rows."""
+    f0 = np.take(frames, before)
+    f1 = np.take(frames, after)
+    v0 = np.take(values, before)
+    v1 = np.take(values, after)
+    if interpolation == InterpolationType.Nearest:
+        return np.where(t < f1, v0, v1)
+    dt = f1 - f0
+    s = np.where(dt > 0, (t - f0) / np.where(dt > 0, dt, 1), 0)
+    if interpolation == InterpolationType.Linear:
+        return v0 + (v1 - v0) * s
+    s2 = s * s
+    s3 = s2 * s
+    return (
+        (2 * s3 - 3 * s2 + 1) * v0
+        + (s3 - 2 * s2 + s) * dt * np.take(out_slopes, before)
+        + (3 * s2 - 2 * s3) * v1
+        + (s3 - s2) * dt * np.take(in_slopes, after)
+    )
+
+
+def cubic_range(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The lowest and highest values between 0 and 1 of the cubics with the
+    values in each column at 0, 1/3, 2/3 and 1, leaving out the ends. They're
+    either at a third or two thirds, or where the cubic turns."""
+    a, b, c, d = CUBIC @ values
+    # the roots of the slope 3as^2 + 2bs + c, in a form that stays accurate
+    # when a or b is small
+    q = -(b + np.copysign(np.sqrt(np.maximum(b * b - 3 * a * c, 0)), b))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.stack([q / (3 * a), c / q])
+    s = np.where((s > 0) & (s < 1), s, 1 / 3)
+    values = np.concatenate([values[1:3], ((a * s + b) * s + c) * s + d])
+    return values.min(axis=0), values.max(axis=0)
+
+
+class Rows:
+    """The keys of many segments, one row after the other in flat arrays.
+    Rows may have different numbers of keys, and their first and last keys are
+    always kept, so no span between kept keys crosses from one to the next."""
+
+    frames: np.ndarray
+    values: np.ndarray
+    in_slopes: np.ndarray
+    out_slopes: np.ndarray
+    starts: np.ndarray  # index of each row's first key
+    ends: np.ndarray  # index of each row's last key
+    row: np.ndarray  # which row each key is in
+
+    def __init__(self, keys: list[tuple[np.ndarray, ...]]) -> None:
+        """Takes the frames, values, in slopes and out slopes of each row."""
+        self.frames, self.values, self.in_slopes, self.out_slopes = (
+            np.concatenate([row[i] for row in keys]) for i in range(4)
+        )
+        lengths = np.array([len(row[0]) for row in keys])
+        self.ends = np.cumsum(lengths) - 1
+        self.starts = self.ends - lengths + 1
+        self.row = np.repeat(np.arange(len(keys)), lengths)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def keys(self, i: int) -> slice:
+        return slice(self.starts[i], self.ends[i] + 1)
+
+
+class Samples:
+    """Where the error of a reduced curve is measured: the frame, the original
+    curve's value there, the keys either side and the row. The keys come first,
+    then a third of the way through each span between keys, then two thirds of
+    the way. Errors are measured for each key and then each span, so a span's
+    keys and row are those of its sample a third of the way through."""
+
+    t: np.ndarray
+    values: np.ndarray
+    before: np.ndarray
+    after: np.ndarray
+    spans: np.ndarray  # the key each span starts at
+    row: np.ndarray  # of each key and span
+
+    def __init__(self, rows: Rows, interpolation: InterpolationType):
+        keys = np.arange(len(rows.frames))
+        if interpolation == InterpolationType.Nearest:
+            self.before = self.after = keys
+            self.t = rows.frames
+            self.values = rows.values
+            self.spans = keys[:0]
+        else:
+            inner = np.ones(len(keys), bool)
+            inner[rows.ends] = False
+            self.spans = inner = keys[inner]
+            self.before = np.concatenate([keys, inner, inner])
+            self.after = np.concatenate([keys, inner + 1, inner + 1])
+            steps = rows.frames[inner + 1] - rows.frames[inner]
+            self.t = np.concatenate(
+                [
+                    rows.frames,
+                    rows.frames[inner] + steps / 3,
+                    rows.frames[inner] + steps * 2 / 3,
+                ]
+            )
+            self.values = evaluate(
+                rows.frames,
+                rows.values,
+                rows.in_slopes,
+                rows.out_slopes,
+                interpolation,
+                self.before,
+                self.after,
+                self.t,
+            )
+        self.row = rows.row[self.before[: len(keys) + len(self.spans)]]
+
+    def extent(self, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """The lowest and highest a cubic between keys with the given values at
+        the samples gets, at each key and inside each span."""
+        keys = len(values) - 2 * len(self.spans)
+        low, high = cubic_range(
+            np.stack(
+                [
+                    values[self.spans],
+                    values[keys : keys + len(self.spans)],
+                    values[keys + len(self.spans) :],
+                    values[self.spans + 1],
+                ]
+            )
+        )
+        return (
+            np.concatenate([values[:keys], low]),
+            np.concatenate([values[:keys], high]),
+        )
+
+    def error(self, values: np.ndarray) -> np.ndarray:
+        """How far a curve with the given values at the samples gets from the
+        original, at each key and inside each span, or only at each key if it
+        is only given values there."""
+        if len(values) < len(self.values):
+            return np.abs(values - self.values[: len(values)])
+        low, high = self.extent(values - self.values)
+        return np.maximum(-low, high)
+
+    def row_max(self, values: np.ndarray, rows: int) -> np.ndarray:
+        result = np.full(rows, -np.inf)
+        np.maximum.at(result, self.row[: len(values)], values)
+        return result
+
+
+def reduce(
+    rows: Rows,
+    in_slopes: np.ndarray,
+    out_slopes: np.ndarray,
+    interpolation: InterpolationType,
+    samples: Samples,
+    tolerances: list[float],
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Which keys to keep for each of the tolerances, largest first, along
+    with the largest error of each row with only those keys. The error may be
+    above tolerance if the keys can't reproduce the samples, which only happens
+    when they're fitted rather than kept. Each tolerance carries on from the
+    keys kept for the one before."""
+    n = len(rows.frames)
+    keys = np.arange(n)
+    keep = np.zeros(n, bool)
+    keep[rows.starts] = keep[rows.ends] = True
+    tolerances = list(tolerances)
+    results = []
+    # a linear curve is furthest from a linear original at a key
+    points = slice(None if interpolation == InterpolationType.CubicSpline else n)
+    while True:
+        previous = np.maximum.accumulate(np.where(keep, keys, 0))
+        following = np.minimum.accumulate(np.where(keep, keys, n)[::-1])[::-1]
+        before = previous[samples.before[points]]
+        after = following[samples.after[points]]
+        error = samples.error(
+            evaluate(
+                rows.frames,
+                rows.values,
+                in_slopes,
+                out_slopes,
+                interpolation,
+                before,
+                after,
+                samples.t[points],
+            )
+        )
+        # the key a key or span adds back if it's too far off
+        measured = slice(len(error))
+        before = before[measured]
+        candidate = np.where(
+            keep[samples.before[measured]],
+            samples.after[measured],
+            samples.before[measured],
+        )
+        bad = (error > tolerances[0]) & ~keep[candidate]
+        if not bad.any():
+            results.append((keep.copy(), samples.row_max(error, len(rows))))
+            tolerances.pop(0)
+            if not tolerances:
+                return results
+            continue
+        # add the worst key of every span that's too far off
+        span = before[bad]
+        worst = np.zeros(n)
+        np.maximum.at(worst, span, error[bad])
+        add = error[bad] == worst[span]
+        keep[candidate[bad][add]] = True
+
+
+def fitted_slopes(rows: Rows) -> np.ndarray:
+    """Slopes for hermite keys through a linear curve, averaging the slopes of
+    the lines either side of each key."""
+    steps = np.diff(rows.frames)
+    lines = np.diff(rows.values) / np.where(steps > 0, steps, np.inf)
+    left = np.concatenate([[0], lines])
+    right = np.concatenate([lines, [0]])
+    slopes = (left + right) / 2
+    slopes[rows.starts] = right[rows.starts]
+    slopes[rows.ends] = left[rows.ends]
+    slopes[rows.starts[rows.starts == rows.ends]] = 0
+    return slopes
+
+
+def with_keys(
+    segment: FloatSegment,
+    keep: np.ndarray,
+    frames: np.ndarray,
+    values: np.ndarray,
+    in_slopes: np.ndarray,
+    out_slopes: np.ndarray,
+) -> FloatSegment:
+    """A copy of the segment with only the kept keys."""
+    result = FloatSegment()
+    result.start_frame = segment.start_frame
+    result.end_frame = segment.end_frame
+    result.interpolation = segment.interpolation
+    result.quantization = segment.quantization
+    for name, keys in (
+        ("frames", frames),
+        ("key_values", values),
+        ("in_slopes", in_slopes),
+        ("out_slopes", out_slopes),
+    ):
+        getattr(result, name).frombytes(keys[keep].tobytes())
+    return result
+
+
+def size(segment: FloatSegment) -> int:
+    """The bytes a segment takes, including the curve's offset to it."""
+    segment.refresh_struct()
+    return segment.struct.size + 4
+
+
+def reduce_segments(
+    segments: list[FloatSegment], rows: Rows, tolerance: float
+) -> list[FloatSegment]:
+    """What each segment should be replaced with: a single value if it stays
+    within tolerance of one, otherwise whichever of its keys, its reduced keys
+    or its fitted hermite keys takes the fewest bytes once quantized within
+    what's left of the tolerance. The segments give the frame range,
+    interpolation and quantization of each row, and must all have the same
+    interpolation."""
+    interpolation = segments[0].interpolation
+    samples = Samples(rows, interpolation)
+    low, high = samples.extent(samples.values)
+    low = -samples.row_max(-low, len(rows))
+    high = samples.row_max(high, len(rows))
+    constant = high - low <= 2 * tolerance
+
+    # fewer keys stored as floats, or more keys leaving room to quantize them
+    tolerances = (tolerance, tolerance / 2)
+    reductions = [
+        (interpolation, rows.in_slopes, rows.out_slopes, keep, error)
+        for keep, error in reduce(
+            rows, rows.in_slopes, rows.out_slopes, interpolation, samples, tolerances
+        )
+    ]
+    if interpolation == InterpolationType.Linear:
+        slopes = fitted_slopes(rows)
+        reductions += [
+            (InterpolationType.CubicSpline, slopes, slopes, keep, error)
+            for keep, error in reduce(
+                rows,
+                slopes,
+                slopes,
+                InterpolationType.CubicSpline,
+                samples,
+                tolerances,
+            )
+        ]
+
+    results = []
+    for i, segment in enumerate(segments):
+        keys = rows.keys(i)
+        if constant[i]:
+            result = FloatSegment()
+            result.start_frame = segment.start_frame
+            result.end_frame = segment.end_frame
+            result.single_value = float((low[i] + high[i]) / 2)
+            results.append(result)
+            continue
+        candidates = [
+            (
+                with_keys(
+                    segment,
+                    slice(None),
+                    rows.frames[keys],
+                    rows.values[keys],
+                    rows.in_slopes[keys],
+                    rows.out_slopes[keys],
+                ),
+                0.0,
+            )
+        ]
+        for fit, fit_in_slopes, fit_out_slopes, keep, error in reductions:
+            if keep[keys].all() or error[i] > tolerance:
+                continue
+            candidate = with_keys(
+                segment,
+                keep[keys],
+                rows.frames[keys],
+                rows.values[keys],
+                fit_in_slopes[keys],
+                fit_out_slopes[keys],
+            )
+            if fit != interpolation:
+                candidate.interpolation = fit
+                candidate.quantization = QuantizationType.UnifiedHermite96
+            candidates.append((candidate, error[i]))
+        for candidate, error in candidates:
+            candidate.quantize(tolerance - error)
+        results.append(
+            min(
+                (candidate for candidate, _ in candidates),
+                key=lambda s: (size(s), len(s.frames)),
+            )
+        )
+    return results
+
+
+def split_values(values: np.ndarray, first: int, last: int, limit: float) -> list[int]:
+    """Splits the keys from first to last until their values span no more than
+    limit, returning the keys it split at along with first and last."""
+    piece = values[first : last + 1]
+    if piece.max() - piece.min() <= limit or len(piece) <= 2 * MIN_KEYS:
+        return [first, last]
+    spread = np.maximum(
+        np.maximum.accumulate(piece) - np.minimum.accumulate(piece),
+        (np.maximum.accumulate(piece[::-1]) - np.minimum.accumulate(piece[::-1]))[::-1],
+    )
+    # both sides share the key split at
+    key = first + MIN_KEYS + int(np.argmin(spread[MIN_KEYS:-MIN_KEYS]))
+    return (
+        split_values(values, first, key, limit)
+        + split_values(values, key, last, limit)[1:]
+    )
+
+
+def split(
+    frames: np.ndarray,
+    values: np.ndarray,
+    interpolation: InterpolationType,
+    tolerance: float,
+) -> list[int]:
+    """The keys to split a curve into segments at, along with its first and
+    last key:
+
+    - where the spacing between keys changes, so that each segment's speed
+      finds keys quickly
+    - where a linear curve bends too sharply for hermite keys to follow with
+      one slope, so that it can change interpolation there
+    - where the values span more than the smallest quantized formats can hold
+      within tolerance"""
+    steps = np.diff(frames)
+    ratios = steps[1:] / np.where(steps[:-1] > 0, steps[:-1], np.inf)
+    changes = (ratios > 2) | (ratios < 1 / 2)
+    if interpolation == InterpolationType.Linear:
+        lines = np.diff(values) / np.where(steps > 0, steps, np.inf)
+        # averaging the lines either side puts the middle of the longer span
+        # off by a sixteenth of its length times the difference
+        bends = np.abs(np.diff(lines)) * np.maximum(steps[1:], steps[:-1])
+        changes |= bends > 8 * tolerance
+    points = [0]
+    for key in np.flatnonzero(changes) + 1:
+        if key - points[-1] >= MIN_KEYS and len(frames) - 1 - key >= MIN_KEYS:
+            points.append(int(key))
+    points.append(len(frames) - 1)
+    limit = VALUE_RANGE * tolerance
+    keys = [0]
+    for first, last in itertools.pairwise(points):
+        keys += split_values(values, first, last, limit)[1:]
+    return keys
+
+
+def piece(segment: FloatSegment, start_frame: float, end_frame: float):
+    """An empty segment like this one, over a different range of frames."""
+    result = FloatSegment()
+    result.interpolation = segment.interpolation
+    result.quantization = segment.quantization
+    result.start_frame = start_frame
+    result.end_frame = end_frame
+    return result
+
+
+def reduce_animation(canm: CANM, tolerance: float):
+    """Drops the keys the float curves of the animation don't need and
+    quantizes the rest, keeping every curve within tolerance of its keys.
+    Curves that stay within tolerance of one value become constants, and
+    curves that take fewer bytes as several segments are split."""
+    channels = []
+    for path in canm.member_animations_data:
+        member = canm.member_animations_data[path]
+        for name in member.channels:
+            curve = getattr(member, name)
+            if not isinstance(curve, FloatAnimationCurve):
+                continue
+            if (
+                len(curve.segments) == 1
+                and curve.segments[0].single_value is None
+                and curve.segments[0].quantization in FLOAT_QUANTIZATIONS
+                and curve.segments[0].frames
+            ):
+                channels.append((member, name, curve))
+            else:
+                for segment in curve.segments:
+                    segment.quantize(tolerance)
+
+    def group(channel):
+        return channel[2].segments[0].interpolation
+
+    channels.sort(key=group)
+    for _, grouped in itertools.groupby(channels, group):
+        # each curve is reduced both whole and split, in one go
+        segments = []
+        keys = []
+        splits = []
+        for member, name, curve in grouped:
+            segment = curve.segments[0]
+            columns = [
+                np.frombuffer(getattr(segment, column))
+                for column in ("frames", "key_values", "in_slopes", "out_slopes")
+            ]
+            segments.append(segment)
+            keys.append(columns)
+            points = split(columns[0], columns[1], segment.interpolation, tolerance)
+            pieces = list(itertools.pairwise(points)) if len(points) > 2 else []
+            for first, last in pieces:
+                segments.append(
+                    piece(
+                        segment,
+                        segment.start_frame if first == 0 else columns[0][first],
+                        segment.end_frame if last == points[-1] else columns[0][last],
+                    )
+                )
+                keys.append([column[first : last + 1] for column in columns])
+            splits.append((member, name, curve, len(pieces)))
+        results = iter(reduce_segments(segments, Rows(keys), tolerance))
+        for member, name, curve, pieces in splits:
+            whole = next(results)
+            parts = [next(results) for _ in range(pieces)]
+            if whole.single_value is not None:
+                setattr(member, name, whole.single_value)
+            elif parts and sum(map(size, parts)) < size(whole):
+                curve.segments = parts
+            else:
+                curve.segments = [whole]
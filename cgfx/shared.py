@@ -5,6 +5,11 @@ from typing import Generic, TypeVar
 
 T = TypeVar("T")
 
+# bytes at each end of a placed blob that it is indexed by
+EDGE = 16
+# overlaps with the end of the IMAG data to try before placing a blob after it
+MAX_OVERLAP_TRIES = 8
+
 
 class Signature:
     data: str
@@ -14,31 +19,74 @@ class Signature:
 
 
 class StringTable:
+    """The strings in the string table, stored null-terminated. A string that is
+    the end of another one is always stored as part of it."""
+
     table: OrderedDict[bytes, int]
+    # the entry in table of each string added, by id, along with the string to
+    # keep the id valid, so that looking a string up again doesn't encode it
+    # again
+    interned: dict[int, tuple[str, bytes]]
+    # entries that aren't stored as the end of another entry
+    stored: list[bytes]
+    saved: int  # bytes not stored thanks to shared suffixes
     total = 0
     padding: int
     offset: int
 
     def __init__(self) -> None:
         self.table = OrderedDict()
+        self.interned = {}
+        self.stored = []
+        self.saved = 0
 
     @staticmethod
-    def correct(s: bytes | str) -> bytes:
-        if isinstance(s, str):
-            return s.encode() + b"\0"
-        else:
-            # textures are aligned to 16 bytes
-            # vertex buffers aren't but aligning everything is easier
-            return s + b"\0" * (-len(s) % 16)
-        return s
+    def correct(s: str) -> bytes:
+        return s.encode() + b"\0"
+
+    def intern(self, s: str) -> bytes:
+        """Returns the entry for s in the table, adding it if needed."""
+        entry = self.interned.get(id(s))
+        if entry is not None:
+            return entry[1]
+        data = self.correct(s)
+        if data not in self.table:
+            self.table[data] = self.total
+            self.stored.append(data)
+            self.total += len(data)
+        self.interned[id(s)] = (s, data)
+        return data
 
-    def add(self, s: bytes | str):
-        s = self.correct(s)
-        if s not in self.table:
-            self.table[s] = self.total
-            self.total += len(s)
+    def add(self, s: str):
+        self.intern(s)
+
+    def place_suffixes(self):
+        # strings are read up to their terminator, so a string that is the end
+        # of another one can be stored as part of it. sorted back to front, an
+        # entry is followed by the entries it's the end of, so going backwards
+        # each entry can be put in the longest entry that ends with it, if the
+        # next one ends with it
+        entries = sorted(self.table, key=lambda data: data[::-1])
+        host = {}
+        for i in range(len(entries) - 1, -1, -1):
+            data = entries[i]
+            if i + 1 < len(entries) and entries[i + 1].endswith(data):
+                host[data] = host[entries[i + 1]]
+            else:
+                host[data] = data
+        self.stored = [data for data in self.table if host[data] is data]
+        self.total = 0
+        for data in self.stored:
+            self.table[data] = self.total
+            self.total += len(data)
+        self.saved = 0
+        for data, h in host.items():
+            if h is not data:
+                self.table[data] = self.table[h] + len(h) - len(data)
+                self.saved += len(data)
 
     def prepare(self, offset: int) -> int:
+        self.place_suffixes()
         self.offset = offset
         self.padding = -(offset + self.total) % 16
         self.padding ^= 8  # align content to 16, aka header to halfway through
@@ -52,16 +100,157 @@ class StringTable:
         return len(self.table) == 0
 
     def get(self, s: str) -> int:
-        return self.offset + self.table[self.correct(s)]
+        entry = self.interned.get(id(s))
+        if entry is not None:
+            return self.offset + self.table[entry[1]]
+        data = self.correct(s)
+        position = self.table[data]
+        self.interned[id(s)] = (s, data)
+        return self.offset + position
+
+    def write(self) -> bytes:
+        return b"".join(self.stored) + b"\0" * self.padding
+
+
+class Blob:
+    data: bytes
+    alignment: int
+    position: int  # from the start of the pool
+
+    def __init__(self, data: bytes, alignment: int) -> None:
+        self.data = data
+        self.alignment = alignment
+
+
+class BlobPool:
+    """The data in the IMAG block, like textures and vertex buffers. Blobs are
+    identified by their content, so identical blobs are stored once, and a
+    blob that another one starts or ends with, or that continues where the data
+    placed so far ends, is stored overlapping it."""
+
+    blobs: dict[bytes, Blob]  # by content
+    # the blob of each data added, by id, along with the data to keep the id
+    # valid, so that each data is only looked up in blobs once
+    interned: dict[int, tuple[bytes, Blob]]
+    contents: bytearray
+    # where placed blobs start and end, by their first and last EDGE bytes, so
+    # that placing a blob doesn't search all of contents
+    starts: dict[bytes, list[int]]
+    ends: dict[bytes, list[int]]
+    saved: int  # bytes not stored thanks to overlapping blobs
+    total = 0
+    padding: int
+    offset: int
+
+    def __init__(self) -> None:
+        self.blobs = {}
+        self.interned = {}
+        self.contents = bytearray()
+        self.starts = {}
+        self.ends = {}
+        self.saved = 0
+
+    def intern(self, data: bytes, alignment: int = 16) -> Blob:
+        entry = self.interned.get(id(data))
+        if entry is not None:
+            blob = entry[1]
+            blob.alignment = max(blob.alignment, alignment)
+            return blob
+        # bytes cache their hash, which is cheaper than a digest, and only
+        # equal hashes are compared
+        blob = self.blobs.get(data)
+        if blob is None:
+            blob = self.blobs[data] = Blob(data, alignment)
+        blob.alignment = max(blob.alignment, alignment)
+        self.interned[id(data)] = (data, blob)
+        return blob
+
+    def add(self, data: bytes, alignment: int = 16):
+        self.intern(data, alignment)
+
+    def fits(self, data: bytes, position: int, alignment: int) -> bool:
+        return (
+            position >= 0
+            and position % alignment == 0
+            and self.contents[position : position + len(data)] == data
+        )
+
+    def overlap(self, data: bytes, alignment: int) -> int:
+        """The length of the longest start of data that the placed data ends
+        with, or 0. The last EDGE bytes placed are looked for in data, longest
+        overlap first, giving up after a few tries so that repetitive data
+        doesn't take quadratic time."""
+        tail = bytes(self.contents[-EDGE:])
+        if len(tail) < EDGE:
+            return 0
+        end = len(data)
+        for _ in range(MAX_OVERLAP_TRIES):
+            found = data.rfind(tail, 0, end)
+            if found == -1:
+                return 0
+            overlap = found + EDGE
+            if self.fits(data[:overlap], len(self.contents) - overlap, alignment):
+                return overlap
+            end = overlap - 1
+        return 0
+
+    def place(self, blob: Blob):
+        data = blob.data
+        contents = self.contents
+        # at the start or end of a placed blob
+        positions = self.starts.get(data[:EDGE], []) + [
+            end - len(data) for end in self.ends.get(data[-EDGE:], [])
+        ]
+        for position in positions:
+            if self.fits(data, position, blob.alignment):
+                blob.position = position
+                self.saved += len(data)
+                return
+        # continuing where the last blob ends
+        overlap = self.overlap(data, blob.alignment)
+        if overlap:
+            blob.position = len(contents) - overlap
+            self.saved += overlap
+        else:
+            contents += b"\0" * (-len(contents) % blob.alignment)
+            blob.position = len(contents)
+        contents += data[overlap:]
+        self.starts.setdefault(data[:EDGE], []).append(blob.position)
+        self.ends.setdefault(data[-EDGE:], []).append(blob.position + len(data))
+
+    def prepare(self, offset: int) -> int:
+        # larger blobs first, so that smaller ones can be found in them
+        for blob in sorted(self.blobs.values(), key=lambda b: -len(b.data)):
+            self.place(blob)
+        self.offset = offset
+        self.total = len(self.contents)
+        self.padding = -(offset + self.total) % 16
+        self.padding ^= 8  # same as the string table
+        self.total += self.padding
+        return offset + self.total
+
+    def size(self) -> int:
+        return self.total
+
+    def empty(self) -> bool:
+        return len(self.blobs) == 0
+
+    def get(self, data: bytes) -> int:
+        return self.offset + self.intern(data).position
 
     def write(self) -> bytes:
-        return b"".join(self.table.keys()) + b"\0" * self.padding
+        return bytes(self.contents) + b"\0" * self.padding
 
 
 class BaseObject(ABC):
+    # empty so that subclasses that are created in large numbers can use
+    # __slots__ to do without a __dict__
+    __slots__ = ()
     struct: struct.Struct
     offset: int
     inline = False
+    # alignment of the object's data in the IMAG block
+    blob_alignment = 16
 
     def refresh_struct(self):
         pass
@@ -144,7 +333,7 @@ class BaseObject(ABC):
                         continue
         return values
 
-    def prepare(self, offset: int, strings: StringTable, imag: StringTable) -> int:
+    def prepare(self, offset: int, strings: StringTable, imag: BlobPool) -> int:
         """offset is current offset, returns new offset"""
         self.refresh_struct()
         self.offset = offset
@@ -165,10 +354,10 @@ class BaseObject(ABC):
                 # string (not signature)
                 strings.add(v)
             elif isinstance(v, bytes):
-                imag.add(v)
+                imag.add(v, self.blob_alignment)
         return offset
 
-    def write(self, strings: StringTable, imag: StringTable) -> bytes:
+    def write(self, strings: StringTable, imag: BlobPool) -> bytes:
         values = self.real_values(strings, imag)
         data = self.struct.pack(*values)
         for v in self.flat_values():
@@ -185,11 +374,11 @@ class BaseObject(ABC):
 
 
 class StandardObject(BaseObject):
-    pass
+    __slots__ = ()
 
 
 class InlineObject(BaseObject):
-    pass
+    __slots__ = ()
 
 
 class Reference:
@@ -238,6 +427,7 @@ class List(InlineObject, Generic[T]):
 
 
 class Vector3(InlineObject):
+    __slots__ = ("x", "y", "z")
     struct = struct.Struct("fff")
     x: float
     y: float
@@ -253,6 +443,7 @@ class Vector3(InlineObject):
 
 
 class Vector4(Vector3):
+    __slots__ = ("w",)
     struct = struct.Struct("ffff")
     w: float
 
@@ -265,6 +456,7 @@ class Vector4(Vector3):
 
 
 class Matrix(InlineObject):
+    __slots__ = ("columns",)
     struct = struct.Struct("f" * 12)
     columns: list[Vector4]
 
@@ -287,6 +479,8 @@ class OrientationMatrix(InlineObject):
 
 
 class Color(InlineObject):
+    __slots__ = ("r", "g", "b", "a")
+
     def __init__(self, r, g, b, a):
         self.r = r
         self.g = g
@@ -298,10 +492,12 @@ class Color(InlineObject):
 
 
 class ColorByte(Color):
+    __slots__ = ()
     struct = struct.Struct("BBBB")
 
 
 class ColorFloat(Color):
+    __slots__ = ()
     struct = struct.Struct("ffff")
 
     def as_byte(self) -> ColorByte:
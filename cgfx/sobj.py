@@ -155,24 +155,50 @@ class BoneFlag(IntFlag):
 
 
 class Bone(StandardObject):
+    __slots__ = (
+        "offset",
+        "name",
+        "flags",
+        "joint_id",
+        "parent_id",
+        "parent",
+        "child",
+        "previous_sibling",
+        "next_sibling",
+        "scale",
+        "rotation",
+        "position",
+        "local",
+        "world",
+        "inverse_base",
+        "billboard_mode",
+    )
     struct = Struct("iiiiiiiifffffffff" + "f" * (12 * 3) + "ixxxxxxxx")
-    name = ""
-    flags = BoneFlag(0)
-    joint_id = 0
-    parent_id = -1
-    parent = None
-    child = None
-    previous_sibling = None
-    next_sibling = None
+    name: str
+    flags: BoneFlag
+    joint_id: int
+    parent_id: int
+    parent: "Bone | None"
+    child: "Bone | None"
+    previous_sibling: "Bone | None"
+    next_sibling: "Bone | None"
     scale: Vector3
     rotation: Vector3
     position: Vector3
     local: Matrix
     world: Matrix
     inverse_base: Matrix
-    billboard_mode = BillboardMode.Off
+    billboard_mode: BillboardMode
 
     def __init__(self):
+        self.name = ""
+        self.flags = BoneFlag(0)
+        self.joint_id = 0
+        self.parent_id = -1
+        self.parent = None
+        self.child = None
+        self.previous_sibling = None
+        self.next_sibling = None
         self.scale = Vector3(1, 1, 1)
         self.rotation = Vector3(0, 0, 0)
         self.position = Vector3(0, 0, 0)
@@ -185,6 +211,7 @@ class Bone(StandardObject):
         self.inverse_base = Matrix(
             Vector4(1, 0, 0, 0), Vector4(0, 1, 0, 0), Vector4(0, 0, 1, 0)
         )
+        self.billboard_mode = BillboardMode.Off
 
     def values(self):
         return (
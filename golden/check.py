@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Converts every model in golden/inputs and compares the result with the
+expected output in golden/expected, to check that changes to the converter or
+the CGFX writer don't change the output unintentionally. For each output that
+differs, the first differing field is reported along with the objects it is
+in. The Patricia trees of every DICT in the output are also read back and
+checked against the ones cgfx.patricia.generate builds."""
+
+import argparse
+import contextlib
+import glob
+import io
+import os.path
+import sys
+
+GOLDEN = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(GOLDEN))
+
+import main
+from cgfx.dict import DICT, DictView
+from cgfx.layout import Layout
+from cgfx.shared import InlineObject, StandardObject
+from make_inputs import OPTIONS
+
+
+def first_difference(expected: bytes, actual: bytes) -> int | None:
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return i
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual))
+    return None
+
+
+def explain(layout: Layout, expected: bytes, actual: bytes, offset: int) -> str:
+    field = layout.find(offset)
+    if field is None:
+        return f"first difference at 0x{offset:x}, past the end of the output"
+    message = f"first difference at 0x{offset:x}, in {field.path}, field {field.name}"
+    if field.format.endswith("s") and field.size() > 4:
+        at = offset - field.start
+        message += f" (byte {at} of {field.size()}"
+        if offset < len(expected) and offset < len(actual):
+            message += (
+                f": expected 0x{expected[offset]:02x}, got 0x{actual[offset]:02x}"
+            )
+        return message + ")"
+    return (
+        message + f": expected {field.unpack(expected)!r}, got {field.unpack(actual)!r}"
+    )
+
+
+def dicts(obj: InlineObject, seen: set[int]):
+    for v in obj.flat_values():
+        if isinstance(v, StandardObject) and id(v) not in seen:
+            seen.add(id(v))
+            if isinstance(v, DICT):
+                yield v
+            yield from dicts(v, seen)
+
+
+def check_dicts(name: str, cgfx, data: bytes) -> bool:
+    ok = True
+    for d in dicts(cgfx, set()):
+        for problem in DictView(data, d.offset).validate():
+            print(f"BAD DICT {name} at 0x{d.offset:x}: {problem}")
+            ok = False
+    return ok
+
+
+def check(in_gltf: str, expected_cgfx: str, update: bool, options: dict) -> bool:
+    name = os.path.basename(in_gltf)
+    # warnings are expected for some inputs
+    with contextlib.redirect_stdout(io.StringIO()):
+        cgfx = main.convert_gltf(main.load_gltf(in_gltf), **options)
+        actual = main.write(cgfx)
+    if not check_dicts(name, cgfx, actual):
+        return False
+    if update:
+        with open(expected_cgfx, "wb") as f:
+            f.write(actual)
+        print(f"updated {name}")
+        return True
+    if not os.path.exists(expected_cgfx):
+        print(f"MISSING {name}: no expected output, create it with --update")
+        return False
+    with open(expected_cgfx, "rb") as f:
+        expected = f.read()
+    offset = first_difference(expected, actual)
+    if offset is None:
+        print(f"ok {name}")
+        return True
+    layout = Layout(cgfx, *main.prepare(cgfx))
+    print(f"DIFF {name}: {explain(layout, expected, actual, offset)}")
+    if len(expected) != len(actual):
+        print(f"  expected {len(expected)} bytes, got {len(actual)}")
+    return False
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "names", nargs="*", help="Only check these inputs (default: all of them)"
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Replace the expected outputs with the current ones, after an "
+        "intentional change to the output",
+    )
+    args = parser.parse_args()
+    inputs = sorted(glob.glob(os.path.join(GOLDEN, "inputs", "*.gl[tb]*")))
+    if args.names:
+        inputs = [
+            path
+            for path in inputs
+            if os.path.splitext(os.path.basename(path))[0] in args.names
+        ]
+    results = [
+        check(
+            path,
+            os.path.join(
+                GOLDEN,
+                "expected",
+                os.path.splitext(os.path.basename(path))[0] + ".cgfx",
+            ),
+            args.update,
+            OPTIONS.get(os.path.splitext(os.path.basename(path))[0], {}),
+        )
+        for path in inputs
+    ]
+    if not all(results):
+        sys.exit(f"{results.count(False)} of {len(results)} outputs differ")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Generates the synthetic models in golden/inputs. They only need to be
+regenerated when models are added to CORPUS, after which the expected outputs
+should be created with check.py --update. Models in OPTIONS are converted with
+those options instead of the defaults."""
+
+import os.path
+import sys
+
+GOLDEN = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(GOLDEN), "benchmarks"))
+
+from synthetic import make_glb
+
+CORPUS = {
+    "minimal": dict(vertices=16),
+    "textured": dict(meshes=2, textures=2, texture_size=16, vertices=32),
+    "double_sided": dict(
+        meshes=2,
+        textures=2,
+        texture_size=16,
+        vertices=32,
+        double_sided=True,
+        normal_map=True,
+    ),
+    "blended": dict(meshes=4, textures=2, texture_size=16, vertices=16, blend=True),
+    "skinned": dict(meshes=3, bones=6, textures=1, texture_size=16, vertices=32),
+    "animated": dict(meshes=2, bones=4, keys=20, vertices=32),
+    "step": dict(bones=3, keys=10, vertices=16, interpolation="STEP"),
+    "cubic": dict(bones=3, keys=10, vertices=16, interpolation="CUBICSPLINE"),
+    "reduced": dict(bones=2, keys=120, vertices=16),
+    "reduced_cubic": dict(bones=2, keys=120, vertices=16, interpolation="CUBICSPLINE"),
+}
+
+# conversion options, as taken by main.convert_gltf
+OPTIONS = {
+    "reduced": dict(animation_tolerance=0.001),
+    # small enough that the curves are split into segments
+    "reduced_cubic": dict(animation_tolerance=0.0001),
+}
+
+
+def main():
+    for name, config in CORPUS.items():
+        with open(os.path.join(GOLDEN, "inputs", f"{name}.glb"), "wb") as f:
+            f.write(make_glb(**config))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
 from cgfx.cgfx import CGFX
 from cgfx.cmdl import CMDL, CMDLWithSkeleton
-from cgfx.shared import StringTable, Vector3, Vector4, Matrix
+from cgfx.shared import BlobPool, StringTable, Vector3, Vector4, Matrix
 from cgfx.dict import DictInfo
 from cgfx.txob import ImageTexture, PixelBasedImage, ReferenceTexture
 from cgfx.sobj import (
@@ -38,6 +40,7 @@ from cgfx.mtob import (
     MTOBFlag,
     ConstantColorSource,
     BumpMode,
+    CullMode,
     FragmentLightingFlags,
 )
 from cgfx.animation import (
@@ -55,19 +58,51 @@ from cgfx.canm import (
     CANMBoneTransform,
     InterpolationType,
     QuantizationType,
-    StepLinear64Key,
-    Hermite128Key,
     CANMBoneRgbaColor,
 )
+import copy
+import functools
 import itertools
+import mmap
 import struct
-from cgfx import swizzler
-from PIL import Image
-import gltflib
 from io import BytesIO
 import math
 import argparse
 import os.path
+import glob
+import hashlib
+import importlib.util
+import json
+import socket
+import socketserver
+import sys
+import time
+import types
+from typing import Callable
+from urllib.parse import unquote
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Imports a module when one of its attributes is first used, so that
+    commands that don't convert anything start quickly."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+swizzler = lazy_import("cgfx.swizzler")
+Image = lazy_import("PIL.Image")
+gltflib = lazy_import("gltflib")
+np = lazy_import("numpy")
+reduction = lazy_import("cgfx.reduction")
+metadata = lazy_import("importlib.metadata")
+multiprocessing = lazy_import("multiprocessing")
+cProfile = lazy_import("cProfile")
 
 
 def quat_to_euler(x: float, y: float, z: float, w: float) -> Vector3:
@@ -340,48 +375,393 @@ def make_material_animation(material_animation: GraphicsAnimationGroup, mtob: MT
     member.parent_name = mtob.name
 
 
-def gltf_get_bv_data(gltf: gltflib.GLTF, bv_id: int) -> bytes:
-    bv = gltf.model.bufferViews[bv_id]
-    buf = gltf.model.buffers[bv.buffer]
+def map_file(filename: str) -> memoryview:
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # empty files can't be mapped
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def read_file(filename: str) -> memoryview:
+    with open(filename, "rb") as f:
+        return memoryview(f.read())
+
+
+def load_gltf(filename: str, mapped: bool = True) -> gltflib.GLTF:
+    """Loads a .gltf or .glb file. Rather than being read into memory, the GLB
+    binary chunk and any external files are memory-mapped, so slicing buffer
+    views out of them doesn't copy anything. Long-running processes should pass
+    mapped=False, as a mapped file that is truncated while it is being read
+    crashes the process rather than raising an exception."""
+    basepath = os.path.dirname(filename)
+    load = map_file if mapped else read_file
+    data = load(filename)
+    resources = []
+    if data[:4] == b"glTF":
+        # 12 byte header, then the JSON chunk, then optionally the binary chunk
+        (json_length,) = struct.unpack_from("<I", data, 12)
+        json_data = data[20 : 20 + json_length]
+        bin_start = 20 + json_length + 8
+        if len(data) >= bin_start:
+            (bin_length,) = struct.unpack_from("<I", data, bin_start - 8)
+            resources.append(
+                gltflib.GLBResource(data[bin_start : bin_start + bin_length])
+            )
+    else:
+        json_data = data
+    model = gltflib.GLTFModel.from_json(str(json_data, "utf-8-sig"))
+    for uri in {x.uri for x in (model.buffers or []) + (model.images or []) if x.uri}:
+        if uri.startswith("data:"):
+            resources.append(gltflib.Base64Resource.from_uri(uri))
+        else:
+            resources.append(
+                gltflib.FileResource(
+                    unquote(uri),
+                    basepath,
+                    data=load(os.path.join(basepath, unquote(uri))),
+                )
+            )
+    return gltflib.GLTF(model=model, resources=resources)
+
+
+COMPONENT_DTYPES = {
+    5120: "<i1",
+    5121: "<u1",
+    5122: "<i2",
+    5123: "<u2",
+    5125: "<u4",
+    5126: "<f4",
+}
+
+
+# matrices are indexed by column first, as they are stored column-major
+TYPE_SHAPES = {
+    "SCALAR": (),
+    "VEC2": (2,),
+    "VEC3": (3,),
+    "VEC4": (4,),
+    "MAT2": (2, 2),
+    "MAT3": (3, 3),
+    "MAT4": (4, 4),
+}
+
+
+def gltf_get_buffer_data(gltf: gltflib.GLTF, buffer_id: int) -> bytes | memoryview:
+    buf = gltf.model.buffers[buffer_id]
     if buf.uri is None:
         buf_res = gltf.get_glb_resource()
     else:
         buf_res = gltf.get_resource(buf.uri)
-    return buf_res.data[bv.byteOffset : bv.byteOffset + bv.byteLength]
+    return buf_res.data
 
 
-def gltf_get_accessor_data_vertices(
-    gltf: gltflib.GLTF, acc: int | gltflib.Accessor
-) -> list[bytes]:
+def gltf_get_bv_data(gltf: gltflib.GLTF, bv_id: int) -> bytes | memoryview:
+    bv = gltf.model.bufferViews[bv_id]
+    buf_data = gltf_get_buffer_data(gltf, bv.buffer)
+    start = bv.byteOffset or 0
+    return buf_data[start : start + bv.byteLength]
+
+
+def gltf_get_bv_array(
+    gltf: gltflib.GLTF,
+    bv_id: int,
+    byte_offset: int,
+    count: int,
+    dtype: np.dtype,
+    shape: tuple[int, ...],
+) -> np.ndarray:
+    """Views count elements of the given type in a buffer view as a read-only
+    array, strided if the buffer view is interleaved."""
+    bv = gltf.model.bufferViews[bv_id]
+    if len(shape) == 2:
+        # matrix columns are aligned to 4 bytes
+        column_size = -(-shape[1] * dtype.itemsize // 4) * 4
+        strides = (column_size, dtype.itemsize)
+        element_size = shape[0] * column_size
+    else:
+        strides = (dtype.itemsize,) * len(shape)
+        element_size = dtype.itemsize * math.prod(shape)
+    return np.ndarray(
+        (count, *shape),
+        dtype,
+        gltf_get_buffer_data(gltf, bv.buffer),
+        (bv.byteOffset or 0) + byte_offset,
+        (bv.byteStride or element_size, *strides),
+    )
+
+
+def gltf_get_accessor_data(
+    gltf: gltflib.GLTF, acc: int | gltflib.Accessor, normalize: bool = True
+) -> np.ndarray:
+    """Returns the elements of an accessor as an array of shape
+    (count, *TYPE_SHAPES[type]). Unless it is sparse or normalized, this is a
+    read-only view into the buffer, so use tobytes() to get tightly packed data.
+    Normalized integer data is converted to float32, unless normalize is False."""
     if isinstance(acc, int):
         acc = gltf.model.accessors[acc]
-    bv = gltf.model.bufferViews[acc.bufferView]
-    bv_data = gltf_get_bv_data(gltf, acc.bufferView)
-    start = acc.byteOffset or 0
-    component_sizes = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
-    type_sizes = {
-        "SCALAR": 1,
-        "VEC2": 2,
-        "VEC3": 3,
-        "VEC4": 4,
-        "MAT2": 4,
-        "MAT3": 9,
-        "MAT4": 16,
-    }
-    element_size = component_sizes[acc.componentType] * type_sizes[acc.type]
-    stride = bv.byteStride or element_size
-    return list(
-        bv_data[i : i + element_size]
-        for i in range(start, start + acc.count * stride, stride)
-    )
+    dtype = np.dtype(COMPONENT_DTYPES[acc.componentType])
+    shape = TYPE_SHAPES[acc.type]
+    if acc.bufferView is not None:
+        data = gltf_get_bv_array(
+            gltf, acc.bufferView, acc.byteOffset or 0, acc.count, dtype, shape
+        )
+    else:
+        # accessors without a buffer view are zeros, no need to allocate them
+        data = np.broadcast_to(np.zeros(shape, dtype), (acc.count, *shape))
+    if acc.sparse is not None:
+        sparse = acc.sparse
+        indices = gltf_get_bv_array(
+            gltf,
+            sparse.indices.bufferView,
+            sparse.indices.byteOffset or 0,
+            sparse.count,
+            np.dtype(COMPONENT_DTYPES[sparse.indices.componentType]),
+            (),
+        )
+        data = data.copy()
+        data[indices] = gltf_get_bv_array(
+            gltf,
+            sparse.values.bufferView,
+            sparse.values.byteOffset or 0,
+            sparse.count,
+            dtype,
+            shape,
+        )
+    if normalize and acc.normalized and dtype.kind != "f":
+        data = np.maximum(data / np.iinfo(dtype).max, -1).astype(np.float32)
+    return data
+
+
+class Instrumentation:
+    """Hook through which convert_gltf and write report how long each phase of
+    a conversion takes and how many objects it produced. Phases may be nested
+    or repeated. This one ignores everything, subclasses collect it."""
+
+    def begin(self, phase: str):
+        pass
+
+    def end(self, phase: str):
+        pass
+
+    def count(self, name: str, n: int):
+        pass
+
+
+class PhaseTimer(Instrumentation):
+    """Records the start and end of every phase, and totals the counts."""
+
+    events: list[tuple[str, float, float]]  # phase, start, end
+    stack: list[tuple[str, float]]
+    counts: dict[str, int]
+
+    def __init__(self) -> None:
+        self.events = []
+        self.stack = []
+        self.counts = {}
+
+    def begin(self, phase: str):
+        self.stack.append((phase, time.perf_counter()))
+
+    def end(self, phase: str):
+        begun, start = self.stack.pop()
+        assert begun == phase, f"phase {phase} ended inside {begun}"
+        self.events.append((phase, start, time.perf_counter()))
+
+    def count(self, name: str, n: int):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def totals(self) -> dict[str, tuple[float, int]]:
+        """The total time spent in each phase and how many times it was entered,
+        in the order the phases were first entered."""
+        totals = {}
+        for phase, start, end in sorted(self.events, key=lambda e: e[1]):
+            seconds, calls = totals.get(phase, (0, 0))
+            totals[phase] = (seconds + end - start, calls + 1)
+        return totals
+
+    def chrome_trace(self) -> dict:
+        """The phases in the Trace Event Format, which can be opened in Chrome's
+        about:tracing or Perfetto."""
+        origin = min((start for _, start, _ in self.events), default=0)
+        return {
+            "traceEvents": [
+                {
+                    "name": phase,
+                    "ph": "X",
+                    "ts": (start - origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": 1,
+                    "tid": 1,
+                }
+                for phase, start, end in self.events
+            ],
+            "otherData": self.counts,
+        }
+
+    def __str__(self) -> str:
+        lines = [
+            f"{phase:<18} {seconds * 1000:9.2f}ms"
+            + (f" ({calls}x)" if calls > 1 else "")
+            for phase, (seconds, calls) in self.totals().items()
+        ]
+        lines += [f"{name:<18} {n:9}" for name, n in self.counts.items()]
+        return "\n".join(lines)
+
+
+class WarmCache:
+    """Results that are expensive to recompute, kept between conversions by the
+    conversion server and watch mode. Entries are keyed by hashes of the data
+    they were made from, so edited inputs simply miss, and entries that go
+    unused for max_age conversions are dropped."""
+
+    entries: dict[tuple, list]  # key -> [value, generation last used]
+    generation = 0
+    max_age: int
+    hits = 0
+    misses = 0
+
+    def __init__(self, max_age: int = 8) -> None:
+        self.entries = {}
+        self.max_age = max_age
+
+    def get(self, key: tuple, make: Callable[[], object]) -> object:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self.entries[key] = [make(), self.generation]
+        else:
+            self.hits += 1
+            entry[1] = self.generation
+        return entry[0]
+
+    def end_conversion(self):
+        self.generation += 1
+        self.entries = {
+            key: entry
+            for key, entry in self.entries.items()
+            if self.generation - entry[1] <= self.max_age
+        }
+
+    def __str__(self) -> str:
+        return f"{len(self.entries)} cached, {self.hits} hits, {self.misses} misses"
+
+
+class AccessorCache:
+    """Decoded accessor data for a single conversion, keyed by accessor index.
+    The arrays are shared, so they are made read-only. If a WarmCache is given,
+    arrays are also looked up there by content, so unchanged accessors are
+    reused from earlier conversions."""
+
+    gltf: gltflib.GLTF
+    arrays: dict[tuple[int, bool], np.ndarray]
+    warm: WarmCache | None
+    bv_digests: dict[int, bytes]
+    hits = 0
+    misses = 0
+
+    def __init__(self, gltf: gltflib.GLTF, warm: WarmCache | None = None) -> None:
+        self.gltf = gltf
+        self.arrays = {}
+        self.warm = warm
+        self.bv_digests = {}
+
+    def bv_digest(self, bv_id: int) -> bytes:
+        digest = self.bv_digests.get(bv_id)
+        if digest is None:
+            bv = self.gltf.model.bufferViews[bv_id]
+            h = hashlib.blake2b(repr((bv.byteLength, bv.byteStride)).encode())
+            h.update(gltf_get_bv_data(self.gltf, bv_id))
+            digest = self.bv_digests[bv_id] = h.digest()
+        return digest
+
+    def content_key(self, acc_id: int, normalize: bool) -> tuple:
+        """Identifies an accessor by its layout and the contents of the buffer
+        views it reads, but not where those are in the file, so that edits
+        elsewhere in the file don't invalidate it."""
+        acc = self.gltf.model.accessors[acc_id]
+        key = (
+            "accessor",
+            acc.byteOffset or 0,
+            acc.componentType,
+            acc.normalized and normalize,
+            acc.count,
+            acc.type,
+            None if acc.bufferView is None else self.bv_digest(acc.bufferView),
+        )
+        if acc.sparse is not None:
+            key += (
+                acc.sparse.count,
+                acc.sparse.indices.byteOffset or 0,
+                acc.sparse.indices.componentType,
+                self.bv_digest(acc.sparse.indices.bufferView),
+                acc.sparse.values.byteOffset or 0,
+                self.bv_digest(acc.sparse.values.bufferView),
+            )
+        return key
+
+    def decode(self, acc_id: int, normalize: bool) -> np.ndarray:
+        data = gltf_get_accessor_data(self.gltf, acc_id, normalize)
+        if self.warm is not None:
+            # don't keep views of a mapped file that may be rewritten
+            data = np.array(data)
+        data.flags.writeable = False
+        return data
+
+    def get(self, acc_id: int, normalize: bool = True) -> np.ndarray:
+        data = self.arrays.get((acc_id, normalize))
+        if data is None:
+            self.misses += 1
+            if self.warm is None:
+                data = self.decode(acc_id, normalize)
+            else:
+                data = self.warm.get(
+                    self.content_key(acc_id, normalize),
+                    lambda: self.decode(acc_id, normalize),
+                )
+            self.arrays[acc_id, normalize] = data
+        else:
+            self.hits += 1
+        return data
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.arrays)} accessors decoded, {self.hits} hits, "
+            f"{self.misses} misses ({self.hit_rate():.0%} hit rate)"
+        )
+
+
+def decode_image(image_data: bytes | memoryview) -> Image.Image:
+    im: Image.Image = Image.open(BytesIO(image_data))
+    if im.width > 256:
+        im = im.resize((256, im.height))
+    if im.height > 256:
+        im = im.resize((im.width, 256))
+    im.load()
+    return im
 
 
-def gltf_get_accessor_data_raw(gltf: gltflib.GLTF, acc: gltflib.Accessor) -> bytes:
-    return b"".join(gltf_get_accessor_data_vertices(gltf, acc))
+def make_texture(im: Image.Image, normal: bool) -> ImageTexture:
+    if normal:
+        im = im.convert("RGBA")
+        for x in range(im.width):
+            for y in range(im.height):
+                px = im.getpixel((x, y))
+                im.putpixel((x, y), (255 - px[0], 255 - px[1], px[2]))
+    return swizzler.to_txob(im.transpose(Image.Transpose.FLIP_TOP_BOTTOM))
 
 
 def gltf_get_texture(
-    cgfx: CGFX, gltf: gltflib.GLTF, image_id: int, normal: bool = False
+    cgfx: CGFX,
+    gltf: gltflib.GLTF,
+    image_id: int,
+    normal: bool = False,
+    cache: WarmCache | None = None,
+    instrumentation: Instrumentation | None = None,
 ) -> ImageTexture:
     image = gltf.model.images[image_id]
     tex_name = image.name or image.uri or f"image{image_id}"
@@ -395,20 +775,21 @@ def gltf_get_texture(
     elif image.bufferView is not None:
         image_data = gltf_get_bv_data(gltf, image.bufferView)
 
-    im: Image.Image = Image.open(BytesIO(image_data))
-    if im.width > 256:
-        im = im.resize((256, im.height))
-    if im.height > 256:
-        im = im.resize((im.width, 256))
-    if normal:
-        im = im.convert("RGBA")
-        for x in range(im.width):
-            for y in range(im.height):
-                px = im.getpixel((x, y))
-                im.putpixel((x, y), (255 - px[0], 255 - px[1], px[2]))
-    txob = swizzler.to_txob(im.transpose(Image.Transpose.FLIP_TOP_BOTTOM))
+    if instrumentation is not None:
+        instrumentation.begin("textures")
+    if cache is None:
+        txob = make_texture(decode_image(image_data), normal)
+    else:
+        digest = hashlib.blake2b(image_data).digest()
+        im = cache.get(("image", digest), lambda: decode_image(image_data))
+        # the cached texture is kept pristine, each CGFX gets its own copy
+        txob = copy.deepcopy(
+            cache.get(("texture", digest, normal), lambda: make_texture(im, normal))
+        )
     txob.name = tex_name
     cgfx.data.textures.add(tex_name, txob)
+    if instrumentation is not None:
+        instrumentation.end("textures")
     return txob
 
 
@@ -487,12 +868,75 @@ def make_bones(
     return bones
 
 
-def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
+def signed_shorts(data: np.ndarray, normalized: bool) -> np.ndarray:
+    """Unsigned shorts as signed ones, which the GPU can read. Normalized ones
+    are halved, so that they keep their meaning when scaled as signed shorts,
+    and others have to fit."""
+    if normalized:
+        return (data >> 1).astype("<i2")
+    if data.max(initial=0) > np.iinfo(np.int16).max:
+        raise OverflowError(f"unsigned short {data.max()} doesn't fit a short")
+    return data.astype("<i2")
+
+
+def shift_joints(joints: np.ndarray) -> np.ndarray:
+    """Joint indices made one higher, as the first related bone is the mesh
+    node itself."""
+    shifted = joints.astype(np.int64) + 1
+    if shifted.max(initial=0) > np.iinfo(joints.dtype).max:
+        raise OverflowError(
+            f"joint index {shifted.max() - 1} is too large for its component type"
+        )
+    return shifted.astype(joints.dtype)
+
+
+def reverse_normals(normals: np.ndarray) -> np.ndarray:
+    """Normals pointing the other way, in the same format."""
+    if normals.dtype.kind == "u":
+        raise RuntimeError("unsigned normals can't be reversed")
+    if normals.dtype.kind == "i":
+        # the lowest value has no opposite, but it means the same as one above
+        normals = np.maximum(normals, -np.iinfo(normals.dtype).max)
+    return -normals
+
+
+def optimize_animations(cgfx: CGFX, tolerance: float):
+    """Drops the animation keys curves don't need and stores the rest in the
+    smallest format, keeping every curve within tolerance of the glTF's keys."""
+    for animations in (cgfx.data.skeletal_animations, cgfx.data.material_animations):
+        for name in animations:
+            reduction.reduce_animation(animations[name], tolerance)
+
+
+def convert_gltf(
+    gltf: gltflib.GLTF,
+    accessors: AccessorCache | None = None,
+    cache: WarmCache | None = None,
+    instrumentation: Instrumentation | None = None,
+    animation_tolerance: float | None = None,
+) -> CGFX:
+    if accessors is None:
+        accessors = AccessorCache(gltf, cache)
+    if instrumentation is None:
+        instrumentation = Instrumentation()
     default_sampler = gltflib.Sampler(
         magFilter=9729, minFilter=9729, wrapS=10497, wrapT=10497
     )
     default_material = gltflib.Material(name="glTF default material")
 
+    # double-sided materials can simply disable culling, unless the back faces
+    # are lit and need their own normals facing the other way
+    lit_materials = {
+        (
+            gltf.model.materials[p.material]
+            if p.material is not None
+            else default_material
+        ).name
+        for mesh in gltf.model.meshes or []
+        for p in mesh.primitives
+        if p.attributes.NORMAL is not None
+    }
+
     cgfx = CGFX()
 
     luts = LUTS()
@@ -503,6 +947,7 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
     cgfx.data.models.add("COMMON", cmdl)
     cmdl.name = "COMMON"
 
+    instrumentation.begin("skeleton")
     cmdl.skeleton = SOBJSkeleton()
     node_ids = gltf.model.scenes[gltf.model.scene].nodes
     root_bone = Bone()
@@ -529,9 +974,8 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
             and gltf.model.materials[p.material].alphaMode == "BLEND"
         ) / len(mesh.primitives)
 
-    cmdl.skeleton.bones.dict.nodes[2:] = sorted(
-        cmdl.skeleton.bones.dict.nodes[2:], key=sort_key
-    )
+    # after the scene root
+    cmdl.skeleton.bones.dict.sort(sort_key, start=1)
 
     # clean up joint ids
     node_to_bone = {}
@@ -560,6 +1004,7 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
         and gltf.model.nodes[bone_to_node[cmdl.skeleton.bones[bone_name].joint_id]].mesh
         is not None
     ]
+    instrumentation.end("skeleton")
 
     for node_id in mesh_nodes:
         node = gltf.model.nodes[node_id]
@@ -572,18 +1017,16 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
             # bone.flags |= BoneFlag.HasSkinningMatrix
             skin = gltf.model.skins[node.skin]
             if skin.inverseBindMatrices is not None:
-                ibms = gltf_get_accessor_data_vertices(gltf, skin.inverseBindMatrices)
-                for i, joint_id in enumerate(skin.joints):
-                    ibm = [
-                        struct.unpack("f", bytes(s))[0]
-                        for s in itertools.batched(ibms[i], 4)
-                    ]
+                # transposed so the matrices are indexed by row first
+                ibms = accessors.get(skin.inverseBindMatrices).transpose(0, 2, 1)
+                for joint_id, ibm in zip(skin.joints, ibms.tolist()):
                     sub_bone = cmdl.skeleton.bones[node_to_bone[joint_id]]
                     sub_bone.flags |= BoneFlag.HasSkinningMatrix
                     sub_bone.inverse_base = Matrix(
-                        Vector4(*ibm[::4]), Vector4(*ibm[1::4]), Vector4(*ibm[2::4])
+                        Vector4(*ibm[0]), Vector4(*ibm[1]), Vector4(*ibm[2])
                     )
 
+        instrumentation.begin("materials")
         for material in (
             (
                 gltf.model.materials[p.material]
@@ -646,6 +1089,10 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                             BlendFunction.Zero
                         )
 
+                if material.doubleSided and material.name not in lit_materials:
+                    mtob.rasterization.cull_mode = CullMode.Never
+                    mtob.rasterization.command.param = CullMode.Never
+
                 # multiply base texture with primary color
                 mtob.fragment_shader.texture_combiners[0].src_rgb = 0x030
                 mtob.fragment_shader.texture_combiners[0].src_alpha = 0x030
@@ -698,7 +1145,9 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                     )
                     tex_info = TexInfo(
                         ReferenceTexture(
-                            gltf_get_texture(cgfx, gltf, tex.source, False)
+                            gltf_get_texture(
+                                cgfx, gltf, tex.source, False, cache, instrumentation
+                            )
                         )
                     )
                     tex_param = 0
@@ -728,7 +1177,11 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                         else default_sampler
                     )
                     tex_info = TexInfo(
-                        ReferenceTexture(gltf_get_texture(cgfx, gltf, tex.source, True))
+                        ReferenceTexture(
+                            gltf_get_texture(
+                                cgfx, gltf, tex.source, True, cache, instrumentation
+                            )
+                        )
                     )
                     tex_info.commands[0].head += 8 * mtob.used_texture_coordinates_count
                     tex_info.commands[
@@ -752,12 +1205,22 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                     mtob.used_texture_coordinates_count += 1
                     mtob.fragment_shader.fragment_lighting.bump_mode = BumpMode.AsBump
                     mtob.fragment_shader.fragment_lighting.is_bump_renormalize = True
+        instrumentation.end("materials")
 
+        instrumentation.begin("vertices")
         for i, p in enumerate(mesh.primitives):
             if p.mode is not None and p.mode != 4:
                 raise RuntimeError(
                     "only triangle list primitives are currently supported"
                 )
+            material = (
+                gltf.model.materials[p.material]
+                if p.material is not None
+                else default_material
+            )
+            duplicate_back_faces = (
+                material.doubleSided and material.name in lit_materials
+            )
             sobj_mesh = SOBJMesh(cmdl)
             cmdl.meshes.add(sobj_mesh)
             sobj_mesh.name = (
@@ -766,11 +1229,7 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                 + mtob.name
             )
             sobj_mesh.mesh_node_visibility_index = 65535
-            sobj_mesh.material_index = cmdl.materials.get_index(
-                gltf.model.materials[p.material].name
-                if p.material is not None
-                else default_material.name
-            )
+            sobj_mesh.material_index = cmdl.materials.get_index(material.name)
             sobj_mesh.shape_index = len(cmdl.shapes)
             shape = SOBJShape()
             cmdl.shapes.add(shape)
@@ -788,22 +1247,19 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                 indices = gltf.model.accessors[p.indices]
                 index_stream = IndexStream()
                 index_stream.data_type = indices.componentType
-                index_stream.face_data = gltf_get_accessor_data_raw(gltf, indices)
-                if material.doubleSided:
-                    # duplicate all vertices backwards
-                    rev = reversed(gltf_get_accessor_data_vertices(gltf, indices))
-                    acc_id = list(
-                        v for k, v in p.attributes.__dict__.items() if v is not None
-                    )[0]
-                    count = len(
-                        gltf_get_accessor_data_vertices(
-                            gltf, gltf.model.accessors[acc_id]
-                        )
-                    )
-                    index_stream.face_data += b"".join(
-                        (int.from_bytes(b, "little") + count).to_bytes(len(b), "little")
-                        for b in rev
+                faces = accessors.get(p.indices)
+                index_stream.face_data = faces.tobytes()
+                if duplicate_back_faces:
+                    # duplicate all faces backwards, pointing at the duplicated vertices
+                    acc_id = next(
+                        v for v in p.attributes.__dict__.values() if v is not None
                     )
+                    count = gltf.model.accessors[acc_id].count
+                    if 2 * count > np.iinfo(faces.dtype).max + 1:
+                        raise RuntimeError(
+                            "too many vertices to duplicate for a double-sided material"
+                        )
+                    index_stream.face_data += (faces[::-1] + count).tobytes()
                 primitive.index_streams.add(index_stream)
                 primitive.buffer_objects.add(0)
             for ty, acc_id in p.attributes.__dict__.items():
@@ -828,30 +1284,24 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                     acc.type
                 ]
                 vs.format_type = acc.componentType
+                # normalized data is scaled on the GPU, so keep it as it is
+                verts = accessors.get(acc_id, normalize=False)
                 if acc.componentType == 5123:  # unsigned short doesn't work
                     vs.format_type = 5122  # turn it into signed short
-                vs.vertex_stream_data = gltf_get_accessor_data_raw(gltf, acc)
+                    verts = signed_shorts(verts, acc.normalized)
+                if acc.normalized:
+                    vs.scale = 1 / np.iinfo(verts.dtype).max
                 if ty == "JOINTS_0":
-                    vs.vertex_stream_data = b"".join(
-                        (int.from_bytes(bytes(b), "little") + 1).to_bytes(
-                            len(b), "little"
-                        )
-                        for b in itertools.batched(
-                            vs.vertex_stream_data,
-                            {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}[
-                                acc.componentType
-                            ],
-                        )
-                    )
-                if material.doubleSided:
+                    verts = shift_joints(verts)
+                vs.vertex_stream_data = verts.tobytes()
+                if duplicate_back_faces:
                     # duplicate all vertices but with the normals reversed
-                    verts = vs.vertex_stream_data
                     if ty != "NORMAL":
-                        vs.vertex_stream_data += verts
+                        vs.vertex_stream_data += vs.vertex_stream_data
                     else:
-                        vs.vertex_stream_data += bytes(
-                            [v ^ (0x80 * (i % 4 == 3)) for i, v in enumerate(verts)]
-                        )
+                        vs.vertex_stream_data += reverse_normals(verts).tobytes()
+                instrumentation.count("vertex bytes", len(vs.vertex_stream_data))
+        instrumentation.end("vertices")
 
     visibility_animation = GraphicsAnimationGroup()
     cmdl.animation_group_descriptions.add("VisibilityAnimation", visibility_animation)
@@ -922,16 +1372,16 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
     cflt.name = "TheLight"
     cgfx.data.lights.add(cflt.name, cflt)
 
+    instrumentation.begin("animations")
     if gltf.model.animations:
         skeletal_animation = CANM()
         skeletal_animation.name = "COMMON"
         cgfx.data.skeletal_animations.add(skeletal_animation.name, skeletal_animation)
         skeletal_animation.target_animation_group_name = "SkeletalAnimation"
         skeletal_animation.frame_size = 60 * max(
-            struct.unpack("f", t)[0]
+            float(accessors.get(a.samplers[c.sampler].input).max())
             for a in gltf.model.animations or []
             for c in a.channels
-            for t in gltf_get_accessor_data_vertices(gltf, a.samplers[c.sampler].input)
         )
         for anim in gltf.model.animations or []:
             for node_id, channels in itertools.groupby(
@@ -955,17 +1405,8 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                         if sampler.interpolation
                         else InterpolationType.Linear
                     )
-                    inputs = tuple(
-                        struct.unpack("f", t)[0]
-                        for t in gltf_get_accessor_data_vertices(gltf, sampler.input)
-                    )
-                    outputs = tuple(
-                        tuple(
-                            struct.unpack("f", bytes(c))[0]
-                            for c in itertools.batched(v, 4)
-                        )
-                        for v in gltf_get_accessor_data_vertices(gltf, sampler.output)
-                    )
+                    inputs = accessors.get(sampler.input).tolist()
+                    outputs = accessors.get(sampler.output)
                     match c.target.path:
                         case "weights":
                             print("WARNING: morph target animations are not supported")
@@ -1010,30 +1451,26 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                                 else QuantizationType.Hermite128
                             )
                             if interpolation != InterpolationType.CubicSpline:
-                                for time, (x, y, z) in zip(inputs, outputs):
-                                    bone.pos_x.segments[0].keys.append(
-                                        StepLinear64Key(time * 60, x)
-                                    )
-                                    bone.pos_y.segments[0].keys.append(
-                                        StepLinear64Key(time * 60, y)
-                                    )
-                                    bone.pos_z.segments[0].keys.append(
-                                        StepLinear64Key(time * 60, z)
-                                    )
+                                for time, (x, y, z) in zip(inputs, outputs.tolist()):
+                                    bone.pos_x.segments[0].add_key(time * 60, x)
+                                    bone.pos_y.segments[0].add_key(time * 60, y)
+                                    bone.pos_z.segments[0].add_key(time * 60, z)
                             else:
                                 for time, (
                                     (xa, ya, za),
                                     (xv, yv, zv),
                                     (xb, yb, zb),
-                                ) in zip(inputs, itertools.batched(outputs, 3)):
-                                    bone.pos_x.segments[0].keys.append(
-                                        Hermite128Key(time * 60, xv, xa, xb)
+                                ) in zip(
+                                    inputs, outputs.reshape(len(inputs), 3, -1).tolist()
+                                ):
+                                    bone.pos_x.segments[0].add_key(
+                                        time * 60, xv, xa, xb
                                     )
-                                    bone.pos_y.segments[0].keys.append(
-                                        Hermite128Key(time * 60, yv, ya, yb)
+                                    bone.pos_y.segments[0].add_key(
+                                        time * 60, yv, ya, yb
                                     )
-                                    bone.pos_z.segments[0].keys.append(
-                                        Hermite128Key(time * 60, zv, za, zb)
+                                    bone.pos_z.segments[0].add_key(
+                                        time * 60, zv, za, zb
                                     )
                         case "scale":
                             bone.scale_x = FloatAnimationCurve()
@@ -1075,30 +1512,26 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                                 else QuantizationType.Hermite128
                             )
                             if interpolation != InterpolationType.CubicSpline:
-                                for time, (x, y, z) in zip(inputs, outputs):
-                                    bone.scale_x.segments[0].keys.append(
-                                        StepLinear64Key(time * 60, x)
-                                    )
-                                    bone.scale_y.segments[0].keys.append(
-                                        StepLinear64Key(time * 60, y)
-                                    )
-                                    bone.scale_z.segments[0].keys.append(
-                                        StepLinear64Key(time * 60, z)
-                                    )
+                                for time, (x, y, z) in zip(inputs, outputs.tolist()):
+                                    bone.scale_x.segments[0].add_key(time * 60, x)
+                                    bone.scale_y.segments[0].add_key(time * 60, y)
+                                    bone.scale_z.segments[0].add_key(time * 60, z)
                             else:
                                 for time, (
                                     (xa, ya, za),
                                     (xv, yv, zv),
                                     (xb, yb, zb),
-                                ) in zip(inputs, itertools.batched(outputs, 3)):
-                                    bone.scale_x.segments[0].keys.append(
-                                        Hermite128Key(time * 60, xv, xa, xb)
+                                ) in zip(
+                                    inputs, outputs.reshape(len(inputs), 3, -1).tolist()
+                                ):
+                                    bone.scale_x.segments[0].add_key(
+                                        time * 60, xv, xa, xb
                                     )
-                                    bone.scale_y.segments[0].keys.append(
-                                        Hermite128Key(time * 60, yv, ya, yb)
+                                    bone.scale_y.segments[0].add_key(
+                                        time * 60, yv, ya, yb
                                     )
-                                    bone.scale_z.segments[0].keys.append(
-                                        Hermite128Key(time * 60, zv, za, zb)
+                                    bone.scale_z.segments[0].add_key(
+                                        time * 60, zv, za, zb
                                     )
                         case "rotation":
                             if interpolation == InterpolationType.CubicSpline:
@@ -1144,58 +1577,52 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                                 if interpolation != InterpolationType.CubicSpline
                                 else QuantizationType.Hermite128
                             )
-                            for time, (x, y, z, w) in zip(inputs, outputs):
+                            for time, (x, y, z, w) in zip(inputs, outputs.tolist()):
                                 euler = quat_to_euler(x, y, z, w)
                                 # normalize rotations to smallest distance
                                 if (
                                     interpolation == InterpolationType.Linear
-                                    and len(bone.rot_x.segments[0].keys) > 0
+                                    and len(bone.rot_x.segments[0].frames) > 0
                                 ):
                                     while (
                                         euler.x
-                                        < bone.rot_x.segments[0].keys[-1].value
+                                        < bone.rot_x.segments[0].key_values[-1]
                                         - math.pi
                                     ):
                                         euler.x += 2 * math.pi
                                     while (
                                         euler.x
-                                        > bone.rot_x.segments[0].keys[-1].value
+                                        > bone.rot_x.segments[0].key_values[-1]
                                         + math.pi
                                     ):
                                         euler.x -= 2 * math.pi
                                     while (
                                         euler.y
-                                        < bone.rot_y.segments[0].keys[-1].value
+                                        < bone.rot_y.segments[0].key_values[-1]
                                         - math.pi
                                     ):
                                         euler.y += 2 * math.pi
                                     while (
                                         euler.y
-                                        > bone.rot_y.segments[0].keys[-1].value
+                                        > bone.rot_y.segments[0].key_values[-1]
                                         + math.pi
                                     ):
                                         euler.y -= 2 * math.pi
                                     while (
                                         euler.z
-                                        < bone.rot_z.segments[0].keys[-1].value
+                                        < bone.rot_z.segments[0].key_values[-1]
                                         - math.pi
                                     ):
                                         euler.z += 2 * math.pi
                                     while (
                                         euler.z
-                                        > bone.rot_z.segments[0].keys[-1].value
+                                        > bone.rot_z.segments[0].key_values[-1]
                                         + math.pi
                                     ):
                                         euler.z -= 2 * math.pi
-                                bone.rot_x.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, euler.x)
-                                )
-                                bone.rot_y.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, euler.y)
-                                )
-                                bone.rot_z.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, euler.z)
-                                )
+                                bone.rot_x.segments[0].add_key(time * 60, euler.x)
+                                bone.rot_y.segments[0].add_key(time * 60, euler.y)
+                                bone.rot_z.segments[0].add_key(time * 60, euler.z)
         if (
             gltf.model.extensionsUsed
             and "KHR_animation_pointer" in gltf.model.extensionsUsed
@@ -1207,12 +1634,9 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
             )
             material_animation.target_animation_group_name = "MaterialAnimation"
             material_animation.frame_size = 60 * max(
-                struct.unpack("f", t)[0]
+                float(accessors.get(a.samplers[c.sampler].input).max())
                 for a in gltf.model.animations or []
                 for c in a.channels
-                for t in gltf_get_accessor_data_vertices(
-                    gltf, a.samplers[c.sampler].input
-                )
             )
             for anim in gltf.model.animations or []:
                 for base, channels in itertools.groupby(
@@ -1250,21 +1674,8 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                             if sampler.interpolation
                             else InterpolationType.Linear
                         )
-                        inputs = tuple(
-                            struct.unpack("f", t)[0]
-                            for t in gltf_get_accessor_data_vertices(
-                                gltf, sampler.input
-                            )
-                        )
-                        outputs = tuple(
-                            tuple(
-                                struct.unpack("f", bytes(c))[0]
-                                for c in itertools.batched(v, 4)
-                            )
-                            for v in gltf_get_accessor_data_vertices(
-                                gltf, sampler.output
-                            )
-                        )
+                        inputs = accessors.get(sampler.input).tolist()
+                        outputs = accessors.get(sampler.output)
 
                         bone = CANMBoneRgbaColor()
                         path = c.target.extensions["KHR_animation_pointer"][
@@ -1338,37 +1749,23 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
                         )
 
                         if interpolation != InterpolationType.CubicSpline:
-                            for time, (r, g, b, a) in zip(inputs, outputs):
-                                bone.red.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, r)
-                                )
-                                bone.green.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, g)
-                                )
-                                bone.blue.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, b)
-                                )
-                                bone.alpha.segments[0].keys.append(
-                                    StepLinear64Key(time * 60, a)
-                                )
+                            for time, (r, g, b, a) in zip(inputs, outputs.tolist()):
+                                bone.red.segments[0].add_key(time * 60, r)
+                                bone.green.segments[0].add_key(time * 60, g)
+                                bone.blue.segments[0].add_key(time * 60, b)
+                                bone.alpha.segments[0].add_key(time * 60, a)
                         else:
                             for time, (
                                 (ra, ga, ba, aa),
                                 (rv, gv, bv, av),
                                 (rb, gb, bb, ab),
-                            ) in zip(inputs, itertools.batched(outputs, 3)):
-                                bone.red.segments[0].keys.append(
-                                    Hermite128Key(time * 60, rv, ra, rb)
-                                )
-                                bone.green.segments[0].keys.append(
-                                    Hermite128Key(time * 60, gv, ga, gb)
-                                )
-                                bone.blue.segments[0].keys.append(
-                                    Hermite128Key(time * 60, bv, ba, bb)
-                                )
-                                bone.alpha.segments[0].keys.append(
-                                    Hermite128Key(time * 60, av, aa, ab)
-                                )
+                            ) in zip(
+                                inputs, outputs.reshape(len(inputs), 3, -1).tolist()
+                            ):
+                                bone.red.segments[0].add_key(time * 60, rv, ra, rb)
+                                bone.green.segments[0].add_key(time * 60, gv, ga, gb)
+                                bone.blue.segments[0].add_key(time * 60, bv, ba, bb)
+                                bone.alpha.segments[0].add_key(time * 60, av, aa, ab)
 
     # optional lighting stuff
 
@@ -1470,12 +1867,26 @@ def convert_gltf(gltf: gltflib.GLTF) -> CGFX:
     # member.unknown = 4
     # member.field_type = 12
 
+    if animation_tolerance is not None:
+        optimize_animations(cgfx, animation_tolerance)
+    instrumentation.end("animations")
+    instrumentation.count("bones", cmdl.skeleton.bones.len())
+    instrumentation.count("meshes", len(cmdl.meshes))
+    instrumentation.count("materials", cmdl.materials.len())
+    instrumentation.count("textures", cgfx.data.textures.len())
+    for animations in (cgfx.data.skeletal_animations, cgfx.data.material_animations):
+        for name in animations:
+            instrumentation.count(
+                "animated", animations[name].member_animations_data.len()
+            )
     return cgfx
 
 
-def write(cgfx: CGFX) -> bytes:
+def prepare(cgfx: CGFX) -> tuple[StringTable, BlobPool]:
+    """Lays out the CGFX, followed by its string table and IMAG block, and
+    returns those tables."""
     strings = StringTable()
-    imag = StringTable()
+    imag = BlobPool()
     offset = cgfx.prepare(0, strings, imag)
     offset = strings.prepare(offset)
     cgfx.data.section_size = offset - cgfx.data.offset
@@ -1484,29 +1895,645 @@ def write(cgfx: CGFX) -> bytes:
         offset += 8  # IMAG header
     offset = imag.prepare(offset)
     cgfx.header.file_size = offset
+    return strings, imag
+
+
+def write(cgfx: CGFX, instrumentation: Instrumentation | None = None) -> bytes:
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    instrumentation.begin("prepare")
+    strings, imag = prepare(cgfx)
+    instrumentation.end("prepare")
+    instrumentation.begin("write")
     data = cgfx.write(strings, imag)
     data += strings.write()
     if not imag.empty():
         data += b"IMAG" + imag.size().to_bytes(4, "little") + imag.write()
+    instrumentation.end("write")
+    instrumentation.count("bytes", len(data))
+    instrumentation.count("string bytes saved", strings.saved)
+    instrumentation.count("IMAG bytes saved", imag.saved)
     if len(data) > 0x80000:
         print(f"WARNING: CGFX is too big ({len(data)} bytes, max is {0x80000} bytes)")
     return data
 
 
+def convert_file(
+    in_gltf: str,
+    out_cgfx: str,
+    cache: WarmCache | None = None,
+    instrumentation: Instrumentation | None = None,
+    animation_tolerance: float | None = None,
+    mapped: bool = True,
+):
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    instrumentation.begin("load")
+    gltf = load_gltf(in_gltf, mapped)
+    instrumentation.end("load")
+    cgfx = convert_gltf(
+        gltf,
+        cache=cache,
+        instrumentation=instrumentation,
+        animation_tolerance=animation_tolerance,
+    )
+    data = write(cgfx, instrumentation)
+    with open(out_cgfx, "wb") as f:
+        f.write(data)
+
+
+def profile_conversion(
+    in_gltf: str, out_cgfx: str, profile: str, animation_tolerance: float | None = None
+):
+    """Converts a file, printing the time taken by each phase. If profile ends
+    in .json, the phases are written to it as a Chrome trace, otherwise it is
+    written a cProfile dump, which can be read with pstats or snakeviz."""
+    timer = PhaseTimer()
+    if profile.endswith(".json"):
+        convert_file(
+            in_gltf,
+            out_cgfx,
+            instrumentation=timer,
+            animation_tolerance=animation_tolerance,
+        )
+        with open(profile, "w", encoding="utf-8") as f:
+            json.dump(timer.chrome_trace(), f)
+    else:
+        profiler = cProfile.Profile()
+        profiler.runcall(
+            convert_file,
+            in_gltf,
+            out_cgfx,
+            instrumentation=timer,
+            animation_tolerance=animation_tolerance,
+        )
+        profiler.dump_stats(profile)
+    print(timer)
+
+
+def default_output(in_gltf: str, out_dir: str | None = None) -> str:
+    out_cgfx = os.path.splitext(in_gltf)[0] + ".cgfx"
+    if out_dir is not None:
+        out_cgfx = os.path.join(out_dir, os.path.basename(out_cgfx))
+    return out_cgfx
+
+
+# argparse options that change the output, recorded by incremental builds
+OUTPUT_OPTIONS: tuple[str, ...] = ("animation_tolerance",)
+
+
+def converter_version() -> str:
+    """Hash of the converter's source and the versions of the libraries that
+    affect its output, so that incremental builds notice when it changes."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for path in [os.path.join(root, "main.py")] + sorted(
+        glob.glob(os.path.join(root, "cgfx", "*.py"))
+    ):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    for lib in ("gltflib", "numpy", "pillow"):
+        h.update(metadata.version(lib).encode())
+    return h.hexdigest()
+
+
+def gltf_dependencies(in_gltf: str) -> list[str]:
+    """Returns the glTF file and any external buffer and image files it uses."""
+    with open(in_gltf, "rb") as f:
+        header = f.read(20)
+        if header[:4] == b"glTF":
+            (json_length,) = struct.unpack_from("<I", header, 12)
+            json_data = f.read(json_length)
+        else:
+            json_data = header + f.read()
+    model = json.loads(str(json_data, "utf-8-sig"))
+    basepath = os.path.dirname(in_gltf)
+    uris = {
+        x["uri"]
+        for x in model.get("buffers", []) + model.get("images", [])
+        if "uri" in x and not x["uri"].startswith("data:")
+    }
+    return [in_gltf] + sorted(os.path.join(basepath, unquote(uri)) for uri in uris)
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class BuildManifest:
+    """Records the inputs, converter version and options each output was built
+    from, so that incremental builds can skip outputs that are up to date.
+    Input hashes are only recomputed if the file's size or mtime changed."""
+
+    path: str
+    outputs: dict[str, dict]
+    version: str
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.outputs = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.outputs = json.load(f)["outputs"]
+        self.version = converter_version()
+
+    @staticmethod
+    def stat(path: str) -> list[int]:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def is_up_to_date(self, in_gltf: str, out_cgfx: str, options: dict) -> bool:
+        entry = self.outputs.get(os.path.abspath(out_cgfx))
+        if (
+            entry is None
+            or entry["in_gltf"] != os.path.abspath(in_gltf)
+            or entry["converter"] != self.version
+            or entry["options"] != options
+            or not os.path.exists(out_cgfx)
+        ):
+            return False
+        for path, recorded in entry["inputs"].items():
+            try:
+                stat = self.stat(path)
+            except OSError:
+                return False
+            if stat != recorded["stat"]:
+                if file_hash(path) != recorded["sha256"]:
+                    return False
+                # touched but not changed
+                recorded["stat"] = stat
+        return True
+
+    def snapshot(self, in_gltf: str) -> dict | None:
+        """The stat and hash of each input, taken before converting so that
+        inputs changed during the conversion aren't recorded as up to date.
+        None if an input can't be read, in which case the conversion fails."""
+        try:
+            return {
+                os.path.abspath(path): {
+                    "stat": self.stat(path),
+                    "sha256": file_hash(path),
+                }
+                for path in gltf_dependencies(in_gltf)
+            }
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def record(self, in_gltf: str, out_cgfx: str, options: dict, inputs: dict):
+        self.outputs[os.path.abspath(out_cgfx)] = {
+            "in_gltf": os.path.abspath(in_gltf),
+            "converter": self.version,
+            "options": options,
+            "inputs": inputs,
+        }
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"outputs": self.outputs}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def read_manifest(manifest: str) -> list[tuple[str, str | None]]:
+    """Each line of a manifest is an input path, optionally followed by a tab and
+    an output path. Relative paths are relative to the manifest. Empty lines and
+    lines starting with # are skipped."""
+    basepath = os.path.dirname(manifest)
+    jobs = []
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            in_gltf, _, out_cgfx = line.partition("\t")
+            jobs.append(
+                (
+                    os.path.join(basepath, in_gltf.strip()),
+                    os.path.join(basepath, out_cgfx.strip()) if out_cgfx else None,
+                )
+            )
+    return jobs
+
+
+def batch_job(
+    job: tuple[str, str], animation_tolerance: float | None = None
+) -> tuple[str, str, float, str | None]:
+    """Converts one file of a batch, returning the time taken and the error if
+    it failed, so that one broken input doesn't abort the rest."""
+    start = time.perf_counter()
+    try:
+        convert_file(*job, animation_tolerance=animation_tolerance)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return (*job, time.perf_counter() - start, error)
+
+
+def check_outputs(jobs: list[tuple[str, str]]):
+    """Raises ValueError if several inputs would be converted to the same output,
+    such as inputs with the same name in different directories under --out-dir."""
+    inputs = {}
+    for in_gltf, out_cgfx in jobs:
+        inputs.setdefault(os.path.normcase(os.path.abspath(out_cgfx)), []).append(
+            in_gltf
+        )
+    clashes = [
+        f"{', '.join(paths)} -> {out_cgfx}"
+        for out_cgfx, paths in inputs.items()
+        if len(paths) > 1
+    ]
+    if clashes:
+        raise ValueError("several inputs have the same output: " + "; ".join(clashes))
+
+
+def convert_batch(
+    jobs: list[tuple[str, str]],
+    processes: int | None = None,
+    animation_tolerance: float | None = None,
+) -> list[tuple[str, str]]:
+    """Converts (input, output) pairs across a process pool, printing the time
+    taken for each file. Returns the jobs that failed. The outputs should have
+    been checked to be different with check_outputs."""
+    start = time.perf_counter()
+    failed = []
+    job = functools.partial(batch_job, animation_tolerance=animation_tolerance)
+    if processes == 1:
+        results = map(job, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(job, jobs)
+    try:
+        for in_gltf, out_cgfx, seconds, error in results:
+            if error is None:
+                print(f"{in_gltf} -> {out_cgfx} ({seconds:.2f}s)")
+            else:
+                failed.append((in_gltf, out_cgfx))
+                print(f"FAILED: {in_gltf} ({seconds:.2f}s): {error}")
+    finally:
+        if processes != 1:
+            pool.close()
+            pool.join()
+    print(
+        f"Converted {len(jobs) - len(failed)} of {len(jobs)} files "
+        f"in {time.perf_counter() - start:.2f}s"
+        + (f", {len(failed)} failed" if failed else "")
+    )
+    return failed
+
+
+def parse_request(line: bytes, output_root: str) -> tuple[str, str, float | None]:
+    """The input, output and animation tolerance of a conversion request,
+    raising ValueError if the line isn't one or its output is outside
+    output_root."""
+    request = json.loads(line)
+    if not isinstance(request, dict) or not isinstance(request.get("in_gltf"), str):
+        raise ValueError("not a conversion request")
+    in_gltf = request["in_gltf"]
+    out_cgfx = request.get("out_cgfx") or default_output(in_gltf)
+    animation_tolerance = request.get("animation_tolerance")
+    if not isinstance(out_cgfx, str):
+        raise ValueError("out_cgfx isn't a path")
+    if animation_tolerance is not None and (
+        isinstance(animation_tolerance, bool)
+        or not isinstance(animation_tolerance, (int, float))
+    ):
+        raise ValueError("animation_tolerance isn't a number")
+    real = os.path.realpath(out_cgfx)
+    if os.path.commonpath([real, output_root]) != output_root:
+        raise ValueError(f"{out_cgfx} is outside of {output_root}")
+    return in_gltf, out_cgfx, animation_tolerance
+
+
+class ConversionHandler(socketserver.StreamRequestHandler):
+    """Reads newline-delimited JSON requests like {"in_gltf": ..., "out_cgfx": ...}
+    and replies to each with {"ok": ..., "out_cgfx": ..., "seconds": ...} or
+    {"ok": false, "error": ..., "seconds": ...}. Relative paths are relative to
+    the server's working directory. The connection is closed after the first
+    line that isn't a valid request, as whatever sent it isn't a client."""
+
+    server: "ConversionServer"
+
+    def handle(self):
+        for line in self.rfile:
+            start = time.perf_counter()
+            try:
+                in_gltf, out_cgfx, animation_tolerance = parse_request(
+                    line, self.server.output_root
+                )
+            except ValueError as e:
+                print(f"REFUSED: {e}")
+                self.reply({"ok": False, "error": f"{type(e).__name__}: {e}"}, start)
+                return
+            try:
+                convert_file(
+                    in_gltf,
+                    out_cgfx,
+                    self.server.cache,
+                    animation_tolerance=animation_tolerance,
+                    mapped=False,
+                )
+                response = {"ok": True, "out_cgfx": out_cgfx}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                self.server.cache.end_conversion()
+            seconds = time.perf_counter() - start
+            if response["ok"]:
+                print(f"{in_gltf} -> {out_cgfx} ({seconds:.2f}s)")
+            else:
+                print(f"FAILED: {response['error']}")
+            print(f"  cache: {self.server.cache}")
+            self.reply(response, start)
+
+    def reply(self, response: dict, start: float):
+        response["seconds"] = time.perf_counter() - start
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class ConversionServer(socketserver.TCPServer):
+    """Converts files on request, keeping decoded images, swizzled textures and
+    accessor data warm between requests. Requests are handled one at a time.
+    It listens on a Unix socket only the user can connect to, rather than a
+    TCP port that any local process or web page could send requests to, and
+    only writes outputs inside output_root."""
+
+    cache: WarmCache
+    output_root: str
+
+    def __init__(self, address: str, output_root: str | None = None) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("the conversion server needs Unix sockets")
+        self.address_family = socket.AF_UNIX
+        if os.path.exists(address):
+            # replace the socket of a server that didn't shut down cleanly
+            with socket.socket(socket.AF_UNIX) as sock:
+                if sock.connect_ex(address) == 0:
+                    raise RuntimeError(f"a server is already listening on {address}")
+            os.remove(address)
+        super().__init__(address, ConversionHandler)
+        os.chmod(address, 0o600)
+        self.cache = WarmCache()
+        self.output_root = os.path.realpath(output_root or os.getcwd())
+
+    def server_close(self):
+        super().server_close()
+        os.remove(self.server_address)
+
+
+def serve(address: str, output_root: str | None = None):
+    with ConversionServer(address, output_root) as server:
+        print(f"Listening on {address}, writing inside {server.output_root}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def request_conversion(
+    address: str,
+    in_gltf: str,
+    out_cgfx: str | None = None,
+    animation_tolerance: float | None = None,
+) -> dict:
+    """Asks a running conversion server to convert a file, returning its reply."""
+    request = {
+        "in_gltf": os.path.abspath(in_gltf),
+        "out_cgfx": out_cgfx and os.path.abspath(out_cgfx),
+        "animation_tolerance": animation_tolerance,
+    }
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(address)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def watch_state(in_gltf: str) -> dict[str, list[int]] | None:
+    """The size and mtime of the glTF and the files it references, or None if
+    they can't be read, for example while they are being written."""
+    try:
+        return {path: BuildManifest.stat(path) for path in gltf_dependencies(in_gltf)}
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def watch(
+    in_gltf: str,
+    out_cgfx: str,
+    interval: float = 0.5,
+    animation_tolerance: float | None = None,
+):
+    """Converts in_gltf, then again whenever it or the files it references
+    change, until interrupted. Files are converted once they have stopped
+    changing for an interval, and unchanged images and accessors are reused."""
+    cache = WarmCache()
+    converted = None
+    pending = watch_state(in_gltf)
+    print(f"Watching {in_gltf}")
+    try:
+        while True:
+            state = watch_state(in_gltf)
+            if state is not None and state == pending and state != converted:
+                start = time.perf_counter()
+                try:
+                    convert_file(
+                        in_gltf,
+                        out_cgfx,
+                        cache,
+                        animation_tolerance=animation_tolerance,
+                        mapped=False,
+                    )
+                    print(
+                        f"{in_gltf} -> {out_cgfx} "
+                        f"({time.perf_counter() - start:.2f}s, cache: {cache})"
+                    )
+                except Exception as e:
+                    print(f"FAILED: {in_gltf}: {type(e).__name__}: {e}")
+                finally:
+                    cache.end_conversion()
+                converted = state
+            pending = state
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
 def main():
     parser = argparse.ArgumentParser(description="Convert a glTF model to CGFX.")
-    parser.add_argument("in_gltf", type=str, help="The input glTF (.gltf or .glb)")
+    parser.add_argument(
+        "in_gltf", type=str, help="The input glTF (.gltf or .glb)", nargs="?"
+    )
     parser.add_argument(
         "out_cgfx", type=str, help="The output CGFX (.cgfx)", nargs="?", default=None
     )
+    parser.add_argument(
+        "--animation-tolerance",
+        type=float,
+        metavar="ERROR",
+        help="Drop animation keys and store the rest in smaller, quantized "
+        "formats wherever that keeps curves within ERROR of the original keys "
+        "(in radians for rotations and model units for positions). Experimental: "
+        "the quantized formats haven't been checked on the console",
+    )
+    batch = parser.add_argument_group("batch conversion")
+    batch.add_argument(
+        "--batch",
+        type=str,
+        nargs="+",
+        metavar="INPUT",
+        default=[],
+        help="Convert many input files or glob patterns (** matches subdirectories)",
+    )
+    batch.add_argument(
+        "--manifest",
+        type=str,
+        help="Convert the inputs listed in a file, one per line, "
+        "optionally followed by a tab and the output",
+    )
+    batch.add_argument(
+        "--out-dir",
+        type=str,
+        help="Write batch outputs to this directory instead of next to the inputs",
+    )
+    batch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU)",
+    )
+    incremental = parser.add_argument_group("incremental builds")
+    incremental.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip outputs whose inputs, options and converter are unchanged "
+        "since they were last built",
+    )
+    incremental.add_argument(
+        "--build-manifest",
+        type=str,
+        default=".pycgfx-build.json",
+        help="Where incremental builds record what outputs were built from "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        metavar="FILE",
+        help="Print how long each phase of the conversion takes, and write a "
+        "Chrome trace (if FILE ends in .json) or a cProfile dump to FILE",
+    )
+    live = parser.add_argument_group("live conversion")
+    live.add_argument(
+        "--watch",
+        action="store_true",
+        help="Convert the input again whenever it or the files it references change",
+    )
+    live.add_argument(
+        "--serve",
+        type=str,
+        metavar="ADDRESS",
+        help="Keep running and convert files on request, reusing work between "
+        "requests. ADDRESS is the path of a Unix socket",
+    )
+    live.add_argument(
+        "--output-root",
+        type=str,
+        metavar="DIR",
+        help="The directory the server may write outputs in (default: the "
+        "working directory)",
+    )
+    live.add_argument(
+        "--connect",
+        type=str,
+        metavar="ADDRESS",
+        help="Convert the input using the server listening on ADDRESS",
+    )
     args = parser.parse_args()
+    if args.serve is not None:
+        try:
+            serve(args.serve, args.output_root)
+        except (RuntimeError, OSError) as e:
+            parser.error(str(e))
+        return
+    options = {name: getattr(args, name) for name in OUTPUT_OPTIONS}
+    build = BuildManifest(args.build_manifest) if args.incremental else None
+
+    if args.batch or args.manifest:
+        if args.in_gltf is not None:
+            parser.error("positional inputs can't be combined with --batch/--manifest")
+        if args.connect is not None or args.watch:
+            parser.error(
+                "--connect and --watch can't be combined with --batch/--manifest"
+            )
+        jobs = read_manifest(args.manifest) if args.manifest else []
+        for pattern in args.batch:
+            # patterns that match nothing are kept, to be reported as failures
+            matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+            jobs += [(p, None) for p in matches]
+        jobs = [
+            (in_gltf, out_cgfx or default_output(in_gltf, args.out_dir))
+            for in_gltf, out_cgfx in jobs
+        ]
+        if not jobs:
+            parser.error("no inputs matched")
+        try:
+            check_outputs(jobs)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.out_dir is not None:
+            os.makedirs(args.out_dir, exist_ok=True)
+        if build is not None:
+            stale = [job for job in jobs if not build.is_up_to_date(*job, options)]
+            print(f"{len(jobs) - len(stale)} of {len(jobs)} files are up to date")
+            jobs = stale
+            snapshots = [build.snapshot(in_gltf) for in_gltf, _ in jobs]
+        failed = (
+            convert_batch(jobs, args.jobs, args.animation_tolerance) if jobs else []
+        )
+        if build is not None:
+            for job, inputs in zip(jobs, snapshots):
+                if job not in failed and inputs is not None:
+                    build.record(*job, options, inputs)
+            build.save()
+        if failed:
+            sys.exit(1)
+        return
+
+    if args.in_gltf is None:
+        parser.error("an input glTF is required")
+    if args.connect is not None:
+        response = request_conversion(
+            args.connect, args.in_gltf, args.out_cgfx, args.animation_tolerance
+        )
+        if not response["ok"]:
+            sys.exit(f"FAILED: {args.in_gltf}: {response['error']}")
+        print(f"{args.in_gltf} -> {response['out_cgfx']} ({response['seconds']:.2f}s)")
+        return
     if args.out_cgfx is None:
-        args.out_cgfx = os.path.splitext(args.in_gltf)[0] + ".cgfx"
-
-    gltf = gltflib.GLTF.load(args.in_gltf, load_file_resources=True)
-    cgfx = convert_gltf(gltf)
-    with open(args.out_cgfx, "wb") as f:
-        f.write(write(cgfx))
+        args.out_cgfx = default_output(args.in_gltf)
+    if args.watch:
+        watch(args.in_gltf, args.out_cgfx, animation_tolerance=args.animation_tolerance)
+        return
+
+    if build is not None and build.is_up_to_date(args.in_gltf, args.out_cgfx, options):
+        print(f"{args.out_cgfx} is up to date")
+        build.save()
+        return
+    inputs = build.snapshot(args.in_gltf) if build is not None else None
+    if args.profile is not None:
+        profile_conversion(
+            args.in_gltf, args.out_cgfx, args.profile, args.animation_tolerance
+        )
+    else:
+        convert_file(
+            args.in_gltf, args.out_cgfx, animation_tolerance=args.animation_tolerance
+        )
+    if inputs is not None:
+        build.record(args.in_gltf, args.out_cgfx, options, inputs)
+    if build is not None:
+        build.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import gltflib
+import numpy as np
+import pytest
+
+import main
+from benchmarks.synthetic import make_glb
+from cgfx.primitives import VertexAttributeUsage
+
+
+def test_shift_joints():
+    joints = np.array([[0, 1, 2, 254]], np.uint8)
+    shifted = main.shift_joints(joints)
+    assert shifted.dtype == np.uint8
+    assert shifted.tolist() == [[1, 2, 3, 255]]
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16])
+def test_shift_joints_overflow(dtype):
+    joints = np.array([[0, np.iinfo(dtype).max]], dtype)
+    with pytest.raises(OverflowError):
+        main.shift_joints(joints)
+
+
+def test_reverse_normals():
+    normals = np.array([[-128, 0, 127]], np.int8)
+    assert main.reverse_normals(normals).tolist() == [[127, 0, -127]]
+    floats = np.array([[0.5, -1, 0]], np.float32)
+    assert main.reverse_normals(floats).tolist() == [[-0.5, 1, 0]]
+    with pytest.raises(RuntimeError):
+        main.reverse_normals(np.array([[255, 0, 0]], np.uint8))
+
+
+def model(tmp_path, **config) -> gltflib.GLTF:
+    path = tmp_path / "model.glb"
+    path.write_bytes(make_glb(**config))
+    return main.load_gltf(str(path))
+
+
+def add_buffer_view(gltf: gltflib.GLTF, data: bytes) -> int:
+    """Appends data to the GLB buffer in a new buffer view."""
+    buffer = bytes(gltf.get_glb_resource().data)
+    buffer += b"\0" * (-len(buffer) % 4)
+    gltf.resources[0] = gltflib.GLBResource(buffer + data)
+    gltf.model.buffers[0].byteLength = len(buffer) + len(data)
+    gltf.model.bufferViews.append(
+        gltflib.BufferView(buffer=0, byteOffset=len(buffer), byteLength=len(data))
+    )
+    return len(gltf.model.bufferViews) - 1
+
+
+def add_accessor(gltf: gltflib.GLTF, **kwargs) -> int:
+    gltf.model.accessors.append(gltflib.Accessor(**kwargs))
+    return len(gltf.model.accessors) - 1
+
+
+def test_sparse_accessor(tmp_path):
+    gltf = model(tmp_path)
+    dense = np.arange(12, dtype=np.float32).reshape(4, 3)
+    acc = add_accessor(
+        gltf,
+        bufferView=add_buffer_view(gltf, dense.tobytes()),
+        componentType=5126,
+        count=4,
+        type="VEC3",
+        sparse=gltflib.Sparse(
+            count=2,
+            indices=gltflib.SparseIndices(
+                bufferView=add_buffer_view(gltf, bytes([3, 1])), componentType=5121
+            ),
+            values=gltflib.SparseValues(
+                bufferView=add_buffer_view(gltf, np.full(6, -1, np.float32).tobytes())
+            ),
+        ),
+    )
+    expected = dense.copy()
+    expected[[1, 3]] = -1
+    assert np.array_equal(main.gltf_get_accessor_data(gltf, acc), expected)
+
+
+def test_accessor_without_buffer_view(tmp_path):
+    gltf = model(tmp_path)
+    acc = add_accessor(gltf, componentType=5123, count=5, type="VEC2")
+    data = main.gltf_get_accessor_data(gltf, acc)
+    assert data.shape == (5, 2) and data.dtype == np.uint16 and not data.any()
+    # sparse accessors without a buffer view start out as zeros
+    gltf.model.accessors[acc].sparse = gltflib.Sparse(
+        count=1,
+        indices=gltflib.SparseIndices(
+            bufferView=add_buffer_view(gltf, bytes([2])), componentType=5121
+        ),
+        values=gltflib.SparseValues(
+            bufferView=add_buffer_view(gltf, np.array([7, 8], "<u2").tobytes())
+        ),
+    )
+    data = main.gltf_get_accessor_data(gltf, acc)
+    assert data.tolist() == [[0, 0], [0, 0], [7, 8], [0, 0], [0, 0]]
+
+
+@pytest.mark.parametrize(
+    "dtype, component_type, values, expected",
+    [
+        ("<u1", 5121, [0, 51, 255], [0, 0.2, 1]),
+        ("<i1", 5120, [-128, -127, 127], [-1, -1, 1]),
+        ("<u2", 5123, [0, 13107, 65535], [0, 0.2, 1]),
+        ("<i2", 5122, [-32768, 0, 32767], [-1, 0, 1]),
+    ],
+)
+def test_normalized_accessor(tmp_path, dtype, component_type, values, expected):
+    gltf = model(tmp_path)
+    acc = add_accessor(
+        gltf,
+        bufferView=add_buffer_view(gltf, np.array(values, dtype).tobytes()),
+        componentType=component_type,
+        normalized=True,
+        count=3,
+        type="SCALAR",
+    )
+    data = main.gltf_get_accessor_data(gltf, acc)
+    assert data.dtype == np.float32
+    assert np.allclose(data, expected)
+    raw = main.gltf_get_accessor_data(gltf, acc, normalize=False)
+    assert raw.tolist() == values
+
+
+def test_normalized_unsigned_short_vertices(tmp_path):
+    gltf = model(tmp_path, vertices=16)
+    attributes = gltf.model.meshes[0].primitives[0].attributes
+    count = gltf.model.accessors[attributes.TEXCOORD_0].count
+    texcoords = np.linspace(0, 65535, count * 2).astype("<u2")
+    attributes.TEXCOORD_0 = add_accessor(
+        gltf,
+        bufferView=add_buffer_view(gltf, texcoords.tobytes()),
+        componentType=5123,
+        normalized=True,
+        count=count,
+        type="VEC2",
+    )
+    cgfx = main.convert_gltf(gltf)
+    (stream,) = [
+        vs
+        for vs in cgfx.data.models["COMMON"]
+        .shapes.data.contents[0]
+        .vertex_attributes.data.contents
+        if vs.usage == VertexAttributeUsage.TextureCoordinate0
+    ]
+    assert stream.format_type == 5122
+    stored = np.frombuffer(stream.vertex_stream_data, "<i2")
+    assert stored.min() >= 0
+    assert np.allclose(stored * stream.scale, texcoords / 65535, atol=1 / 32767)
+
+
+def test_signed_shorts():
+    assert main.signed_shorts(np.array([0, 32767], "<u2"), False).tolist() == [
+        0,
+        32767,
+    ]
+    with pytest.raises(OverflowError):
+        main.signed_shorts(np.array([32768], "<u2"), False)
@@ -0,0 +1,54 @@
+import os.path
+import re
+
+import numpy as np
+import pytest
+
+from cgfx.canm import QuantizationType
+from cgfx.quantization import FORMATS, hermite_slope, pack, unpack
+
+
+@pytest.mark.parametrize("quantization", FORMATS)
+def test_pack_round_trip(quantization):
+    format = FORMATS[quantization]
+    rng = np.random.default_rng(0)
+    raw = {}
+    for name, field in format.fields.items():
+        low, high = field.limits()
+        raw[name] = rng.integers(low, high, 100, endpoint=True)
+        raw[name][:2] = low, high
+    data = pack(format, raw)
+    assert len(data) == 100 * format.size
+    fields = unpack(format, data, 1.0, 0.0, 1.0)
+    for name, field in format.fields.items():
+        assert np.array_equal(fields[name] * (1 << field.fraction), raw[name])
+
+
+def test_hermite_slope_is_the_steepest_slope():
+    rng = np.random.default_rng(0)
+    frames = np.cumsum(rng.uniform(0.5, 3, 50))
+    values = rng.normal(size=50)
+    in_slopes, out_slopes = rng.normal(size=(2, 50)) * 3
+    s = np.linspace(0, 1, 10001)[:, None]
+    lines = np.diff(values) / np.diff(frames)
+    m0, m1 = out_slopes[:-1], in_slopes[1:]
+    slopes = 6 * (s - s * s) * lines + m0 * (3 * s * s - 4 * s + 1)
+    slopes += m1 * (3 * s * s - 2 * s)
+    expected = np.abs(slopes).max(axis=0)
+    assert np.allclose(hermite_slope(frames, values, in_slopes, out_slopes), expected)
+
+
+def test_hexpat_matches_formats():
+    path = os.path.join(os.path.dirname(__file__), "..", "cgfx.hexpat")
+    with open(path, encoding="utf-8") as f:
+        hexpat = f.read()
+    bitfields = {
+        name: [int(bits) for bits in re.findall(r":\s*(\d+);", body)]
+        for name, body in re.findall(r"bitfield (\w+) \{(.*?)\};", hexpat, re.S)
+    }
+    # the fields of these are whole u16s, apart from Hermite64's frame and value
+    bitfields["Hermite64Key"] = bitfields["FrameValue12_20"] + [16, 16]
+    bitfields["UnifiedHermite48Key"] = [16, 16, 16]
+    for quantization, format in FORMATS.items():
+        bits = [field.bits for field in format.fields.values()]
+        assert bitfields[f"{QuantizationType(quantization).name}Key"] == bits
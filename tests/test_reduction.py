@@ -0,0 +1,214 @@
+import contextlib
+import copy
+import io
+from array import array
+
+import numpy as np
+import pytest
+
+import main
+from benchmarks.synthetic import make_glb
+from cgfx import quantization
+from cgfx.canm import (
+    FLOAT_QUANTIZATIONS,
+    FloatAnimationCurve,
+    InterpolationType,
+    QuantizationType,
+)
+from cgfx.reduction import cubic_range, evaluate
+
+
+def curves(cgfx) -> dict:
+    result = {}
+    for animations in (
+        cgfx.data.skeletal_animations,
+        cgfx.data.material_animations,
+    ):
+        for animation in animations:
+            members = animations[animation].member_animations_data
+            for path in members:
+                for name in members[path].channels:
+                    result[animation, path, name] = getattr(members[path], name)
+    return result
+
+
+def written_keys(segment, data: bytes) -> list[np.ndarray]:
+    """The keys of a segment as the written CGFX stores them."""
+    columns = ("frames", "key_values", "in_slopes", "out_slopes")
+    if segment.quantization in FLOAT_QUANTIZATIONS:
+        return [np.frombuffer(getattr(segment, column)) for column in columns]
+    format = quantization.FORMATS[segment.quantization]
+    start = segment.offset + segment.struct.size - len(segment.key_data())
+    fields = quantization.unpack(
+        format,
+        data[start : start + format.size * len(segment.frames)],
+        float(np.float32(segment.value_scale)),
+        float(np.float32(segment.value_offset)),
+        float(np.float32(segment.frame_scale)),
+    )
+    zeros = np.zeros(len(segment.frames))
+    return [
+        fields["frame"],
+        fields["value"],
+        fields.get("in_slope", fields.get("slope", zeros)),
+        fields.get("out_slope", fields.get("slope", zeros)),
+    ]
+
+
+def evaluate_curve(curve, t: np.ndarray, data: bytes) -> np.ndarray:
+    if not isinstance(curve, FloatAnimationCurve):
+        return np.full_like(t, curve)
+    result = np.empty_like(t)
+    done = np.zeros(len(t), bool)
+    for segment in curve.segments:
+        inside = ~done
+        if segment is not curve.segments[-1]:
+            inside &= t <= segment.end_frame
+        done |= inside
+        if segment.single_value is not None:
+            result[inside] = segment.single_value
+            continue
+        frames, values, in_slopes, out_slopes = written_keys(segment, data)
+        clamped = np.clip(t[inside], frames[0], frames[-1])
+        after = np.minimum(np.searchsorted(frames, clamped, "right"), len(frames) - 1)
+        before = np.maximum(after - 1, 0)
+        last = clamped >= frames[-1]
+        before[last] = after[last] = len(frames) - 1
+        result[inside] = evaluate(
+            frames,
+            values,
+            in_slopes,
+            out_slopes,
+            segment.interpolation,
+            before,
+            after,
+            clamped,
+        )
+    return result
+
+
+def convert(glb: bytes, tmp_path, tolerance: float | None = None):
+    path = tmp_path / "model.glb"
+    path.write_bytes(glb)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return main.convert_gltf(
+            main.load_gltf(str(path)), animation_tolerance=tolerance
+        )
+
+
+def dense_error(original, reduced, samples: int) -> float:
+    """How far the curves of the reduced CGFX get from the original ones at
+    many frames, once both are written."""
+    original_data = main.write(original)
+    reduced_data = main.write(reduced)
+    reduced_curves = curves(reduced)
+    worst = 0.0
+    for key, curve in curves(original).items():
+        if not isinstance(curve, FloatAnimationCurve):
+            continue
+        frames = np.frombuffer(curve.segments[0].frames)
+        t = np.linspace(frames[0], frames[-1], samples)
+        if curve.segments[0].interpolation == InterpolationType.Nearest:
+            # quantized frames may move a step by up to FRAME_TOLERANCE
+            nearest = np.abs(t[:, None] - frames[None]).min(axis=1)
+            t = t[nearest > quantization.FRAME_TOLERANCE]
+        error = np.abs(
+            evaluate_curve(curve, t, original_data)
+            - evaluate_curve(reduced_curves[key], t, reduced_data)
+        )
+        worst = max(worst, error.max(initial=0))
+    return worst
+
+
+@pytest.mark.parametrize("tolerance", [0.001, 0.01])
+def test_reduced_hermite_curves_stay_within_tolerance(tmp_path, tolerance):
+    glb = make_glb(bones=4, keys=300, interpolation="CUBICSPLINE")
+    original = convert(glb, tmp_path)
+    reduced = convert(glb, tmp_path, tolerance)
+    assert dense_error(original, reduced, 20000) <= tolerance
+
+
+def split_curves(cgfx) -> list:
+    return [
+        curve
+        for curve in curves(cgfx).values()
+        if isinstance(curve, FloatAnimationCurve) and len(curve.segments) > 1
+    ]
+
+
+def test_split_hermite_curves_stay_within_tolerance(tmp_path):
+    # the values range further than the smaller formats can hold at this
+    # tolerance, so the curves are split
+    tolerance = 0.0001
+    glb = make_glb(bones=2, keys=120, interpolation="CUBICSPLINE")
+    original = convert(glb, tmp_path)
+    reduced = convert(glb, tmp_path, tolerance)
+    assert split_curves(reduced)
+    assert dense_error(original, reduced, 20000) <= tolerance
+
+
+def set_keys(curve, interpolation, frames, values, slopes):
+    segment = curve.segments[0]
+    segment.interpolation = interpolation
+    if interpolation == InterpolationType.CubicSpline:
+        segment.quantization = QuantizationType.Hermite128
+    else:
+        segment.quantization = QuantizationType.StepLinear64
+    segment.frames = array("d", frames)
+    segment.key_values = array("d", values)
+    segment.in_slopes = array("d", slopes)
+    segment.out_slopes = array("d", slopes)
+    segment.end_frame = curve.end_frame = frames[-1]
+
+
+def test_split_curves_stay_within_tolerance(tmp_path):
+    tolerance = 0.001
+    cgfx = convert(make_glb(bones=4, keys=20), tmp_path)
+    # keys that get sparse halfway through, with a bend there, and values that
+    # range further than the smaller quantized formats can hold
+    frames = np.concatenate([np.arange(300), np.arange(300, 600, 10)]).astype(float)
+    waves = np.where(frames < 300, np.sin(frames / 40), np.sin(7.5))
+    ramp = np.maximum(frames - 300, 0) / 100
+    members = cgfx.data.skeletal_animations["COMMON"].member_animations_data
+    for i, path in enumerate(members):
+        member = members[path]
+        set_keys(
+            member.pos_x,
+            InterpolationType.Linear,
+            frames,
+            2 * waves + ramp + i,
+            np.zeros(len(frames)),
+        )
+        set_keys(
+            member.scale_x,
+            InterpolationType.CubicSpline,
+            frames,
+            8 * waves + ramp,
+            np.where(frames < 300, np.cos(frames / 40) / 5, 0.01),
+        )
+        set_keys(
+            member.rot_x,
+            InterpolationType.Nearest,
+            frames,
+            np.round((waves + ramp) * 4) / 4,
+            np.zeros(len(frames)),
+        )
+    original = copy.deepcopy(cgfx)
+    main.optimize_animations(cgfx, tolerance)
+    assert split_curves(cgfx)
+    assert dense_error(original, cgfx, 20000) <= tolerance
+
+
+def test_cubic_range_finds_turning_points():
+    rng = np.random.default_rng(0)
+    a, b, c, d = rng.normal(size=(4, 100))
+    s = np.linspace(0, 1, 10001)[:, None]
+    cubics = ((a * s + b) * s + c) * s + d
+    thirds = np.array([0, 1 / 3, 2 / 3, 1])[:, None]
+    values = ((a * thirds + b) * thirds + c) * thirds + d
+    low, high = cubic_range(values)
+    # the ends are left out
+    low = np.minimum(low, np.minimum(values[0], values[3]))
+    high = np.maximum(high, np.maximum(values[0], values[3]))
+    assert np.allclose(low, cubics.min(axis=0), atol=1e-6)
+    assert np.allclose(high, cubics.max(axis=0), atol=1e-6)
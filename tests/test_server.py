@@ -0,0 +1,56 @@
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+import main
+
+
+def test_parse_request(tmp_path):
+    root = str(tmp_path)
+    inside = os.path.join(root, "a.cgfx")
+    line = json.dumps({"in_gltf": "a.glb", "out_cgfx": inside})
+    assert main.parse_request(line, root) == ("a.glb", inside, None)
+    for request in [
+        [],
+        {"out_cgfx": inside},
+        {"in_gltf": 1},
+        {"in_gltf": "a.glb", "out_cgfx": 1},
+        {"in_gltf": "a.glb", "out_cgfx": inside, "animation_tolerance": "1"},
+        {"in_gltf": "a.glb", "out_cgfx": inside, "animation_tolerance": True},
+        {"in_gltf": "a.glb", "out_cgfx": "/tmp/pwned.cgfx"},
+        {"in_gltf": "a.glb", "out_cgfx": os.path.join(root, "..", "a.cgfx")},
+    ]:
+        with pytest.raises(ValueError):
+            main.parse_request(json.dumps(request), root)
+    with pytest.raises(ValueError):
+        main.parse_request(b"POST / HTTP/1.1\r\n", root)
+
+
+def test_server_closes_on_invalid_line(tmp_path):
+    address = str(tmp_path / "server.sock")
+    out_cgfx = tmp_path / "out" / "pwned.cgfx"
+    server = main.ConversionServer(address, str(tmp_path / "root"))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        assert os.stat(address).st_mode & 0o077 == 0
+        request = {"in_gltf": "missing.glb", "out_cgfx": str(out_cgfx)}
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(address)
+            sock.sendall(
+                b"POST / HTTP/1.1\r\nContent-Type: text/plain\r\n\r\n"
+                + json.dumps(request).encode()
+                + b"\n"
+            )
+            with sock.makefile("rb") as f:
+                assert json.loads(f.readline())["ok"] is False
+                assert f.readline() == b""
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    assert not out_cgfx.exists()
+    assert not os.path.exists(address)
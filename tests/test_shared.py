@@ -0,0 +1,39 @@
+from cgfx.shared import BlobPool, StringTable
+
+
+def test_string_table_shares_suffixes():
+    strings = StringTable()
+    names = ["Bone", "SkinnedBone", "Mesh", "one", "Bone", ""]
+    for name in names:
+        strings.add(name)
+    end = strings.prepare(8)
+    data = strings.write()
+    assert end == 8 + len(data) == 8 + strings.size()
+    assert strings.saved == len(b"Bone\0") + len(b"one\0") + len(b"\0")
+    for name in names:
+        position = strings.get(name) - 8
+        assert data[position : data.index(b"\0", position)] == name.encode()
+
+
+def test_blob_pool_overlaps_blobs():
+    imag = BlobPool()
+    whole = bytes(range(64))
+    start, end, more = whole[:32], whole[-20:], whole[48:] + b"\xff" * 16
+    for data in (whole, start, end, more):
+        imag.add(data, 4)
+    imag.prepare(8)
+    assert len(imag.contents) == 80
+    for data in (whole, start, end, more):
+        position = imag.get(data) - 8
+        assert position % 4 == 0
+        assert imag.contents[position : position + len(data)] == data
+
+
+def test_blob_pool_keeps_strictest_alignment():
+    imag = BlobPool()
+    imag.add(b"\1" * 20, 4)
+    data = b"\2" * 20
+    imag.add(data, 4)
+    imag.add(data, 16)
+    imag.prepare(8)
+    assert (imag.get(data) - 8) % 16 == 0
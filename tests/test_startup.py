@@ -0,0 +1,32 @@
+import os.path
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs main.py --help like the command line does, then lists what was imported
+HELP = """
+import runpy, sys
+sys.argv = ["main.py", "--help"]
+try:
+    runpy.run_path("main.py", run_name="__main__")
+except SystemExit:
+    pass
+print(*sys.modules, sep="\\n", file=sys.stderr)
+"""
+
+
+def test_help_does_not_import_heavy_modules():
+    result = subprocess.run(
+        [sys.executable, "-c", HELP],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = result.stderr.split()
+    assert "usage:" in result.stdout
+    # lazily imported modules are in sys.modules from the start, but their
+    # submodules only show up once they're actually loaded
+    for name in ("numpy", "gltflib"):
+        assert not [m for m in modules if m.startswith(name + ".")], name
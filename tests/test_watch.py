@@ -0,0 +1,24 @@
+import os.path
+
+import main
+
+from benchmarks.synthetic import make_glb
+
+
+def test_watch_state_tolerates_truncated_glb(tmp_path):
+    glb = tmp_path / "model.glb"
+    glb.write_bytes(b"glTF\x02\x00\x00\x00")
+    assert main.watch_state(str(glb)) is None
+
+
+def test_unmapped_load_matches_mapped(tmp_path):
+    glb = tmp_path / "model.glb"
+    glb.write_bytes(make_glb(bones=2, keys=4))
+    mapped = main.load_gltf(str(glb))
+    read = main.load_gltf(str(glb), mapped=False)
+    assert [bytes(r.data) for r in mapped.resources] == [
+        bytes(r.data) for r in read.resources
+    ]
+    main.convert_file(str(glb), os.path.join(tmp_path, "a.cgfx"))
+    main.convert_file(str(glb), os.path.join(tmp_path, "b.cgfx"), mapped=False)
+    assert (tmp_path / "a.cgfx").read_bytes() == (tmp_path / "b.cgfx").read_bytes()